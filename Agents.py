@@ -3,11 +3,10 @@ import pandas as pd
 from email.mime.text import MIMEText
 from langchain_openai import ChatOpenAI
 from langchain_core.runnables import Runnable
-from Email_Helper import send_email
+from Email_Helper import send_email, get_transport
 from langgraph.graph import StateGraph
 from dotenv import load_dotenv
 import logging
-import smtplib
 
 # --------- Load Environment Variables --------- #
 load_dotenv()
@@ -99,10 +98,7 @@ class ClassifierAgent: # Communication Hub
         msg['From'] = EMAIL_ADDRESS
         msg['To'] = SENDER_EMAIL_ADDRESS  # Replace with actual recipient
         #logger.info("Hi")
-        with smtplib.SMTP("smtp.gmail.com", 587) as server:
-            server.starttls()
-            server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_ADDRESS, SENDER_EMAIL_ADDRESS, msg.as_string())
+        get_transport().send(msg, [SENDER_EMAIL_ADDRESS], from_addr=EMAIL_ADDRESS)
         logger.info(f"Email sent for {filename} with status {status}")
     
 
@@ -0,0 +1,114 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+
+try:
+    import pyarrow as pa
+except ImportError:  # without pyarrow only same-process handoff is available
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+SWEEP_INTERVAL = 3600  # seconds between sweeps of abandoned spill files in a long-running process
+
+
+# ArtifactStore hands parsed DataFrames between agents by handle
+class ArtifactStore:
+    """Keeps WatchdogAgent's cleaned DataFrame so PreprocessingAgent does not re-parse the CSV.
+
+    Frames produced in this process are kept in memory and returned as-is. Frames
+    produced in a worker process (batch mode) are spilled to an uncompressed Arrow
+    IPC file in `cache_dir` and memory-mapped back by the parent. The state only
+    ever carries the handle string. The least recently used frames are dropped
+    beyond `max_items`, so an abandoned handle cannot pin memory forever. Spill
+    files are removed on `release`; those of runs that failed or crashed before
+    it are swept once older than `max_age` seconds, at startup and then hourly.
+    """
+
+    def __init__(self, cache_dir=".artifacts", max_items=32, max_age=24 * 3600):
+        self.cache_dir = cache_dir
+        self.max_items = max_items
+        self.max_age = max_age
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self.sweep()
+
+    def _path(self, handle):
+        return os.path.join(self.cache_dir, f"{handle}.arrow")
+
+    def put(self, df, name, spill=False):
+        handle = f"{name}-{uuid.uuid4().hex[:12]}"
+        if spill:
+            if pa is None:
+                return None  # the consumer falls back to reading the CSV
+            os.makedirs(self.cache_dir, exist_ok=True)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            with pa.OSFile(self._path(handle), 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            return handle
+        with self._lock:
+            self._frames[handle] = df
+            while len(self._frames) > self.max_items:
+                self._frames.popitem(last=False)
+        return handle
+
+    def get(self, handle):
+        if handle is None:
+            return None
+        with self._lock:
+            if handle in self._frames:
+                self._frames.move_to_end(handle)
+                return self._frames[handle]
+        if pa is None or not os.path.exists(self._path(handle)):
+            return None
+        with pa.memory_map(self._path(handle), 'r') as source:
+            return pa.ipc.open_file(source).read_all().to_pandas()
+
+    def release(self, handle):
+        if handle is None:
+            return
+        with self._lock:
+            self._frames.pop(handle, None)
+        try:
+            os.remove(self._path(handle))
+        except OSError:
+            pass
+        if time.monotonic() - self._last_sweep > SWEEP_INTERVAL:
+            self.sweep()
+
+    def sweep(self):
+        """Remove spill files older than `max_age`, returns how many were removed."""
+        self._last_sweep = time.monotonic()
+        try:
+            entries = list(os.scandir(self.cache_dir))
+        except OSError:  # nothing was spilled yet
+            return 0
+        cutoff, removed = time.time() - self.max_age, 0
+        for entry in entries:
+            try:
+                if entry.name.endswith(".arrow") and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:  # released by another process meanwhile
+                pass
+        if removed:
+            logger.info(f"ArtifactStore removed {removed} abandoned spill file(s) from {self.cache_dir}")
+        return removed
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store():
+    """Process-wide ArtifactStore shared by the agents."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore(cache_dir=os.getenv("ARTIFACT_DIR", ".artifacts"),
+                                   max_age=float(os.getenv("ARTIFACT_MAX_AGE_HOURS", "24")) * 3600)
+        return _store
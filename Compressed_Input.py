@@ -0,0 +1,60 @@
+import os
+import gzip
+import zipfile
+from contextlib import contextmanager
+
+try:
+    import zstandard
+except ImportError:  # .csv.zst drops then fail with a clear error, everything else works
+    zstandard = None
+
+COMPRESSED_EXTENSIONS = ('.csv.gz', '.csv.zst')  # one CSV each, pandas also reads these back by suffix
+ARCHIVE_EXTENSIONS = ('.zip',)  # many CSVs in one drop, one report per member
+PACKED_EXTENSIONS = COMPRESSED_EXTENSIONS + ARCHIVE_EXTENSIONS
+
+
+def is_packed(path):
+    return path.endswith(PACKED_EXTENSIONS)
+
+
+def _open_compressed(file_path):
+    if file_path.endswith('.csv.gz'):
+        return gzip.open(file_path, 'rb')
+    if zstandard is None:
+        raise ImportError(f"{os.path.basename(file_path)} needs the zstandard package")
+    return zstandard.open(file_path, 'rb')
+
+
+def _member_stem(member):
+    return os.path.basename(member).split('.')[0]
+
+
+@contextmanager
+def csv_members(file_path):
+    """The CSVs inside a packed drop file as (member, stem, profile_path, open_member).
+
+    `open_member()` returns a fresh binary stream that decompresses as it is
+    read, nothing is unpacked to disk. A .csv.gz/.csv.zst is one member named
+    None. A .zip yields every .csv member; with more than one, the stems
+    become `{archive}_{member}` like workbook sheets. `profile_path` is what
+    Schema_Profile keys the member's profile on.
+    """
+    file_name = os.path.basename(file_path)
+    stem = file_name.split('.')[0]
+    if not file_name.endswith(ARCHIVE_EXTENSIONS):
+        yield [(None, stem, file_path, lambda: _open_compressed(file_path))]
+        return
+    with zipfile.ZipFile(file_path) as archive:
+        infos = [info for info in archive.infolist()
+                 if not info.is_dir() and info.filename.endswith('.csv') and not info.filename.startswith('__MACOSX/')]
+        members, stems = [], set()
+        for info in infos:
+            member_stem = stem if len(infos) == 1 else f"{stem}_{_member_stem(info.filename)}"
+            n = 1
+            while member_stem in stems:  # same file name in two directories of the archive
+                n += 1
+                member_stem = f"{stem}_{_member_stem(info.filename)}_{n}"
+            stems.add(member_stem)
+            profile_path = os.path.join(os.path.dirname(file_path), os.path.basename(info.filename))
+            members.append((info.filename, member_stem, profile_path, lambda info=info: archive.open(info)))
+        yield members
@@ -1,8 +1,15 @@
 import os
+import time
+import queue
+import logging
 import smtplib
+import threading
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from email.mime.base import MIMEBase
+from email import encoders
 from dotenv import load_dotenv
+from Pipeline_Metrics import record_smtp_send
 
 # --------- Load Environment Variables --------- #
 load_dotenv()
@@ -10,6 +17,148 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 EMAIL_ADDRESS = os.getenv("EMAIL_ADDRESS")  # your Gmail or SMTP email
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")  # your app-specific password or SMTP password
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"  # set to 0 for a local aiosmtpd / debugging server
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+
+logger = logging.getLogger(__name__)
+
+
+# --------- Pooled SMTP Transport --------- #
+class SMTPTransport:
+    """Shared pool of authenticated SMTP sessions.
+
+    STARTTLS + login is paid once per connection instead of once per message.
+    Idle connections are checked with NOOP before reuse and dropped when the
+    server has hung up; a send that fails on a dead connection is retried once
+    on a fresh one. `send_many` pushes several messages through one session.
+    """
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, username=EMAIL_ADDRESS, password=EMAIL_PASSWORD,
+                 starttls=SMTP_STARTTLS, pool_size=SMTP_POOL_SIZE, noop_after=10.0, max_idle=240.0, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.noop_after = noop_after  # idle seconds after which a pooled connection is NOOP-checked
+        self.max_idle = max_idle  # idle seconds after which the server has most likely closed it
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()  # (server, last_used), most recently used first
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            server.starttls()
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        logger.info(f"SMTPTransport opened connection to {self.host}:{self.port}")
+        return server
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    def _checkout(self):
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    server, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                idle = time.monotonic() - last_used
+                if idle > self.max_idle:
+                    self._close(server)
+                    continue
+                if idle < self.noop_after:
+                    return server
+                try:
+                    if server.noop()[0] == 250:
+                        return server
+                except (smtplib.SMTPException, OSError):
+                    pass
+                self._close(server)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _checkin(self, server):
+        if server is not None:
+            self._idle.put((server, time.monotonic()))
+        self._slots.release()
+
+    def send_many(self, messages, from_addr=None):
+        """Send `(msg, to_addrs)` pairs over one pooled session, reconnecting on failure."""
+        from_addr = from_addr or self.username
+        server = self._checkout()
+        try:
+            for msg, to_addrs in messages:
+                start = time.perf_counter()
+                try:
+                    server.sendmail(from_addr, to_addrs, msg.as_string())
+                except (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError):  # stale session
+                    self._close(server)
+                    server = None
+                    server = self._connect()
+                    server.sendmail(from_addr, to_addrs, msg.as_string())
+                record_smtp_send(time.perf_counter() - start)
+        except BaseException:
+            if server is not None:
+                self._close(server)
+            self._checkin(None)
+            raise
+        self._checkin(server)
+
+    def send(self, msg, to_addrs, from_addr=None):
+        self.send_many([(msg, to_addrs)], from_addr=from_addr)
+
+    def close(self):
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(server)
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """Process-wide SMTPTransport shared by every agent and the failure alerts."""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = SMTPTransport()
+        return _transport
+
+
+# --------- Build Email Function --------- #
+def build_message(recipient, subject, body, attachment=None, sender=EMAIL_ADDRESS):
+    # Only attach files if present
+    if attachment and os.path.isfile(attachment):
+        msg = MIMEMultipart()
+        msg.attach(MIMEText(body, 'plain'))
+        with open(attachment, 'rb') as f:
+            part = MIMEBase('application', 'octet-stream')
+            part.set_payload(f.read())
+        encoders.encode_base64(part)
+        part.add_header('Content-Disposition', f'attachment; filename="{os.path.basename(attachment)}"')
+        msg.attach(part)
+    else:
+        msg = MIMEText(body, 'plain')
+    msg['Subject'] = subject
+    msg['From'] = sender
+    msg['To'] = recipient
+    return msg
+
 
 # --------- Send Email Function --------- #
 def send_email(recipient, subject, body):
@@ -21,10 +170,7 @@ def send_email(recipient, subject, body):
     msg.attach(MIMEText(body, 'plain'))
 
     try:
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
-            server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            server.send_message(msg)
+        get_transport().send(msg, [recipient])
         print(f"[Email Sent] To: {recipient}, Subject: {subject}")
     except Exception as e:
         print(f"[Email Error] Failed to send email: {e}")
-
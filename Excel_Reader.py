@@ -0,0 +1,72 @@
+import os
+import logging
+import pandas as pd
+
+try:
+    import python_calamine  # Rust reader, several times faster than openpyxl for values
+except ImportError:
+    python_calamine = None
+
+logger = logging.getLogger(__name__)
+
+# Comma separated sheet names to validate, all sheets when unset
+EXCEL_SHEETS = [s.strip() for s in os.getenv("EXCEL_SHEETS", "").split(",") if s.strip()]
+
+
+def excel_engine():
+    return "calamine" if python_calamine is not None else "openpyxl"
+
+
+def _sheet_is_empty(ws):
+    """Cheap "no data rows" check from the sheet's <dimension> record.
+
+    Read-only worksheets know max_row without parsing the rows. When the record is
+    missing or claims a header-only sheet (some writers always write A1), peek at
+    row 2 through the streaming parser to confirm.
+    """
+    if ws.max_row is not None and ws.max_row > 1:
+        return False
+    for _ in ws.iter_rows(min_row=2, max_row=2, values_only=True):
+        return False
+    return True
+
+
+def _frame_from_rows(ws):
+    rows = ws.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return pd.DataFrame()
+    # same unnamed-column labels pd.read_excel uses
+    columns = [name if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    # blank cells come back as None (null to isnull, like read_excel's NaN), drop trailing blank rows
+    return df.loc[: df.last_valid_index()] if not df.empty and df.last_valid_index() is not None else df.iloc[:0]
+
+
+def read_sheets(file_path, sheets=None):
+    """Yield (sheet_name, DataFrame) for each selected sheet of a workbook.
+
+    Sheets whose dimension shows no data rows are yielded as an empty frame
+    without parsing them. The remaining sheets are read with the calamine engine
+    when python-calamine is installed, else streamed through openpyxl in
+    read_only/values_only mode instead of pd.read_excel's full object model.
+    """
+    from openpyxl import load_workbook
+
+    sheets = sheets or EXCEL_SHEETS
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        names = [name for name in wb.sheetnames if not sheets or name in sheets]
+        missing = set(sheets) - set(wb.sheetnames)
+        if missing:
+            logger.warning(f"{os.path.basename(file_path)} has no sheet(s) {sorted(missing)}")
+        for name in names:
+            ws = wb[name]
+            if _sheet_is_empty(ws):
+                yield name, pd.DataFrame()
+            elif python_calamine is not None:
+                yield name, pd.read_excel(file_path, sheet_name=name, engine="calamine")
+            else:
+                yield name, _frame_from_rows(ws)
+    finally:
+        wb.close()  # read-only workbooks keep the zip file open until closed
@@ -0,0 +1,144 @@
+import os
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+
+try:
+    import xxhash
+except ImportError:  # xxhash is optional, BLAKE2 from the stdlib is the fallback
+    xxhash = None
+
+logger = logging.getLogger(__name__)
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """Stream the file through a fast hash without loading it into memory."""
+    h = xxhash.xxh3_128() if xxhash is not None else hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def anchor_digest(path, offset, head_bytes=64 * 1024, tail_bytes=4096):
+    """Hash of the file's first `head_bytes` and of the `tail_bytes` right before `offset`.
+
+    Cheap fingerprint of an already processed prefix: if either end of it was
+    rewritten (rather than appended to), the digest changes.
+    """
+    h = xxhash.xxh3_128() if xxhash is not None else hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        h.update(f.read(min(head_bytes, offset)))
+        start = max(min(head_bytes, offset), offset - tail_bytes)
+        f.seek(start)
+        h.update(f.read(offset - start))
+    return h.hexdigest()
+
+
+# FileLedger remembers which drop-folder files were already processed
+class FileLedger:
+    """SQLite ledger of processed files keyed by path, size, mtime and content hash.
+
+    `is_processed` answers from a single primary-key lookup plus `os.stat` when
+    size and mtime are unchanged. The file is only hashed when its stat changed,
+    so a file that was merely touched or copied over with the same bytes is
+    still recognised as already processed. For CSVs it can also keep the
+    progress of incremental processing: byte offset, row counts and an
+    `anchor_digest` of the processed prefix.
+    """
+
+    def __init__(self, db_path="processed_files.db"):
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS processed_files ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, content_hash TEXT, processed_at REAL)"
+        )
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(processed_files)")}
+        for column, kind in (("byte_offset", "INTEGER"), ("rows", "INTEGER"), ("clean_rows", "INTEGER"), ("anchor_hash", "TEXT"),
+                             ("data_status", "INTEGER")):
+            if column not in columns: # ledgers created before incremental processing
+                self.conn.execute(f"ALTER TABLE processed_files ADD COLUMN {column} {kind}")
+        self.conn.commit()
+
+    def _lookup(self, path):
+        return self.conn.execute(
+            "SELECT size, mtime_ns, content_hash FROM processed_files WHERE path = ?", (os.path.abspath(path),)
+        ).fetchone()
+
+    def is_processed(self, path):
+        st = os.stat(path)
+        with self._lock:
+            row = self._lookup(path)
+            if row is not None:
+                size, mtime_ns, content_hash = row
+                if size == st.st_size and mtime_ns == st.st_mtime_ns:
+                    self.hits += 1
+                    return True
+                if size == st.st_size and file_digest(path) == content_hash:  # touched, same bytes
+                    self.conn.execute(
+                        "UPDATE processed_files SET mtime_ns = ? WHERE path = ?", (st.st_mtime_ns, os.path.abspath(path))
+                    )
+                    self.conn.commit()
+                    self.hits += 1
+                    return True
+            self.misses += 1
+            return False
+
+    def mark_processed(self, path, content_hash=None, progress=None, stat=None):
+        """Record `path` as processed, False when it changed since `stat` (size, mtime_ns) was taken.
+
+        `stat` is the file's stat from before it was processed: a version
+        uploaded during the run is then left for the next run instead of being
+        recorded as processed.
+        """
+        content_hash = content_hash or file_digest(path)
+        st = os.stat(path) # after hashing, so a change while hashing is caught as well
+        if stat is not None and tuple(stat) != (st.st_size, st.st_mtime_ns):
+            logger.info(f"{path} changed while it was processed, leaving it for the next run")
+            return False
+        progress = progress or {}
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO processed_files (path, size, mtime_ns, content_hash, processed_at, byte_offset, rows, clean_rows, anchor_hash, "
+                "data_status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (os.path.abspath(path), st.st_size, st.st_mtime_ns, content_hash, time.time(), progress.get("offset"),
+                 progress.get("rows"), progress.get("clean_rows"), progress.get("anchor_hash"), progress.get("data_status")),
+            )
+            self.conn.commit()
+        return True
+
+    def mark_reports(self, reports):
+        """Record the sources of a run's reports, with the stat and progress WatchdogAgent left in them.
+
+        A source is hashed once however many reports it gave (workbook sheets,
+        zip members), and not at all when the ResultCache already hashed it.
+        """
+        digests = {}
+        for report in reports:
+            path = report["source_path"]
+            content_hash = report.get("content_hash") or digests.get(path) or digests.setdefault(path, file_digest(path))
+            self.mark_processed(path, content_hash=content_hash, progress=report.pop("progress", None),
+                                stat=report.pop("source_stat", None))
+
+    def progress(self, path):
+        """Where incremental processing of `path` stopped, None if it was never processed with offsets."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT byte_offset, rows, clean_rows, anchor_hash, data_status FROM processed_files WHERE path = ?", (os.path.abspath(path),)
+            ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return {"offset": row[0], "rows": row[1], "clean_rows": row[2], "anchor_hash": row[3], "data_status": row[4]}
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": self.hits / total if total else 0.0}
+
+    def close(self):
+        self.conn.close()
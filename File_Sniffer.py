@@ -0,0 +1,54 @@
+import os
+import re
+import mmap
+
+HEAD_BYTES = 64 * 1024  # files up to this size are classified from a single read
+SCAN_BYTES = 1 << 20  # slice size for counting newlines through the memory map
+
+# anything but commas, quotes and line breaks is a value (pandas keeps " " as a value too)
+_VALUE_BYTE = re.compile(rb'[^,"\r\n]')
+
+
+def _count_newlines(buf, start):
+    return sum(buf[i:i + SCAN_BYTES].count(b"\n") for i in range(start, len(buf), SCAN_BYTES))
+
+
+def _classify(buf, count_rows=True):
+    """(rows, empty) for the bytes of a whole CSV."""
+    match = _VALUE_BYTE.search(buf)
+    if match is None: # nothing but line breaks and commas, pandas raises EmptyDataError on these
+        return 0, True
+    header_end = buf.find(b"\n", match.start())
+    if header_end == -1: # header only, no newline after it
+        return 0, True
+    header_end += 1
+    if _VALUE_BYTE.search(buf, header_end) is None: # header-only, or every data line is just delimiters
+        rows = sum(1 for line in buf[header_end:].splitlines() if line)
+        return rows, True
+    if not count_rows:
+        return None, False
+    rows = _count_newlines(buf, header_end) + (0 if buf[-1:] == b"\n" else 1)
+    return rows, False
+
+
+def sniff_csv(file_path, head_bytes=HEAD_BYTES, count_rows=True):
+    """Classify a CSV from its raw bytes before pandas touches it.
+
+    Returns {"size", "rows", "empty"}. `empty` is True for zero-byte, blank,
+    header-only and all-delimiter files, which are data_status 0 without a
+    DataFrame. `rows` counts the data lines after the header (for non-empty
+    files an upper bound, blank lines and quoted line breaks are included). Small files are classified from one bounded read, larger ones by a
+    scan over a memory map that never copies more than SCAN_BYTES at a time;
+    with `count_rows=False` a large non-empty file stops at its first value and
+    reports rows as None.
+    """
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return {"size": 0, "rows": 0, "empty": True}
+    with open(file_path, 'rb') as f:
+        if size <= head_bytes:
+            rows, empty = _classify(f.read())
+            return {"size": size, "rows": rows, "empty": empty}
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            rows, empty = _classify(mm, count_rows)
+    return {"size": size, "rows": rows, "empty": empty}
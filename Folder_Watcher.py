@@ -0,0 +1,142 @@
+import os
+import time
+import logging
+import threading
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+from watchdog.observers.polling import PollingObserver
+
+from Compressed_Input import PACKED_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+WATCHED_EXTENSIONS = ('.csv', '.xlsx') + PACKED_EXTENSIONS
+
+
+class _DropFolderHandler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_moved(self, event): # files renamed into place after upload
+        if not event.is_directory:
+            self.watcher.notify(event.dest_path)
+
+    def on_closed(self, event): # inotify IN_CLOSE_WRITE, the writer is done with the file
+        if not event.is_directory:
+            self.watcher.notify(event.src_path, closed=True)
+
+
+# FolderWatcher wakes the pipeline only when a CSV/XLSX file lands in the folder
+class FolderWatcher:
+    """Event-driven replacement for the fixed `time.sleep(60)` polling loop.
+
+    Uses inotify on Linux (through the `watchdog` package) and falls back to a
+    polling observer when inotify is unavailable or `use_polling` is set, e.g.
+    for network shares. A file is handed out once its writer has closed it, or
+    once its size and mtime have not changed for `settle_seconds`, so partially
+    written uploads are never picked up. `folder_path` may also be a list of
+    folders, which are all watched by the same observer thread.
+    """
+
+    def __init__(self, folder_path, settle_seconds=1.0, poll_interval=1.0, use_polling=False):
+        self.folder_path = folder_path
+        self.folder_paths = [folder_path] if isinstance(folder_path, str) else list(folder_path)
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.use_polling = use_polling
+        self.observer = None
+        self._pending = {}  # path -> {"detected": first event, "last_event": ..., "stat": (size, mtime), "closed": bool}
+        self._cond = threading.Condition()
+
+    def start(self):
+        for folder in self.folder_paths:
+            os.makedirs(folder, exist_ok=True)
+        handler = _DropFolderHandler(self)
+        if not self.use_polling:
+            try:
+                self.observer = Observer()
+                for folder in self.folder_paths:
+                    self.observer.schedule(handler, folder, recursive=False)
+                self.observer.start()
+                logger.info(f"FolderWatcher watching {self.folder_paths} with {type(self.observer).__name__}")
+                return self
+            except OSError as e:  # e.g. inotify watch limit reached
+                logger.warning(f"FolderWatcher could not start native observer ({e}), falling back to polling")
+        self.observer = PollingObserver(timeout=self.poll_interval)
+        for folder in self.folder_paths:
+            self.observer.schedule(handler, folder, recursive=False)
+        self.observer.start()
+        logger.info(f"FolderWatcher polling {self.folder_paths} every {self.poll_interval}s")
+        return self
+
+    def stop(self):
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+            self.observer = None
+
+    def notify(self, path, closed=False):
+        if not path.endswith(WATCHED_EXTENSIONS):
+            return
+        now = time.monotonic()
+        with self._cond:
+            entry = self._pending.setdefault(path, {"detected": now, "stat": None, "closed": False})
+            entry["last_event"] = now
+            entry["closed"] = closed
+            self._cond.notify_all()
+
+    def _stat(self, path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_size, st.st_mtime_ns)
+
+    def _collect_ready(self, now):
+        ready = []
+        for path, entry in list(self._pending.items()):
+            current = self._stat(path)
+            if current is None:  # deleted or moved away before it settled
+                del self._pending[path]
+                continue
+            if entry["closed"]:
+                ready.append((path, entry["detected"]))
+                del self._pending[path]
+            elif now - entry["last_event"] >= self.settle_seconds:
+                if current == entry["stat"]:
+                    ready.append((path, entry["detected"]))
+                    del self._pending[path]
+                else:  # still growing, check again after another settle period
+                    entry["stat"] = current
+                    entry["last_event"] = now
+        return ready
+
+    def wait_for_files(self, timeout=None):
+        """Block until at least one file has finished writing.
+
+        Returns a list of `(path, detected_at)` tuples where `detected_at` is the
+        `time.monotonic()` of the first event seen for that file, so callers can
+        report detect-to-invoke latency. Returns an empty list on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                ready = self._collect_ready(now)
+                if ready:
+                    return ready
+                if deadline is not None and now >= deadline:
+                    return []
+                wait = self.settle_seconds if self._pending else None
+                if deadline is not None:
+                    wait = min(wait, deadline - now) if wait is not None else deadline - now
+                self._cond.wait(wait)
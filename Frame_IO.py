@@ -0,0 +1,42 @@
+import os
+import pandas as pd
+
+# Output formats for the Updated/ training split, the bank-facing Revised/ split is always CSV
+OUTPUT_FORMATS = {
+    "csv": (".csv", None),
+    "parquet": (".parquet", "zstd"),
+    "feather": (".feather", "lz4"),
+}
+
+
+def output_file_name(file_name, output_format="csv"):
+    """`Partial.csv` -> `Partial.parquet` for the columnar formats."""
+    if output_format == "csv":
+        return file_name
+    extension, _ = OUTPUT_FORMATS[output_format]
+    return file_name.split('.')[0] + extension
+
+
+def write_frame(df, path, output_format="csv", compression=None):
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output_format!r}, expected one of {sorted(OUTPUT_FORMATS)}")
+    _, default_compression = OUTPUT_FORMATS[output_format]
+    if output_format == "parquet":
+        df.to_parquet(path, index=False, compression=compression or default_compression)
+    elif output_format == "feather":
+        df.reset_index(drop=True).to_feather(path, compression=compression or default_compression)
+    else:
+        df.to_csv(path, index=False)
+    return path
+
+
+def read_frame(path, **kwargs):
+    """Load a split written by `write_frame` (or an original drop file) with the loader for its suffix."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".parquet":
+        return pd.read_parquet(path, **kwargs)
+    if extension in (".feather", ".arrow"):
+        return pd.read_feather(path, **kwargs)
+    if extension == ".xlsx":
+        return pd.read_excel(path, **kwargs)
+    return pd.read_csv(path, **kwargs)
@@ -0,0 +1,336 @@
+import os
+import time
+import uuid
+import shutil
+import random
+import zipfile
+import logging
+import sqlite3
+import threading
+from collections import deque
+
+from Email_Helper import get_transport, build_message
+
+logger = logging.getLogger(__name__)
+
+
+def keep_copy(attachment, root):
+    """Copy `attachment` to `root/<uuid>/<name>`, None when there is no such file.
+
+    Notifications are sent later than they are made; the copy is what gets
+    mailed, even if the split is rewritten or removed in the meantime. One
+    directory per copy keeps the file name the recipient sees.
+    """
+    if not attachment or not os.path.isfile(attachment):
+        return None
+    folder = os.path.join(root, uuid.uuid4().hex)
+    os.makedirs(folder)
+    copy = os.path.join(folder, os.path.basename(attachment))
+    shutil.copyfile(attachment, copy)
+    return copy
+
+
+def remove_copy(copy):
+    if copy:
+        shutil.rmtree(os.path.dirname(copy), ignore_errors=True)
+
+
+# NotificationOutbox keeps outbound emails on disk until they are delivered
+class NotificationOutbox:
+    """Durable SQLite queue of notifications.
+
+    Agents only `enqueue` a record and return; an `OutboxWorker` delivers it
+    later. Records stay `pending` until the SMTP send succeeds, so nothing is
+    lost if the process restarts (delivery is at-least-once). Failed sends are
+    retried with exponential backoff and given up as `dead` after `max_attempts`.
+    Attachments are copied under `attachment_dir` on `enqueue`, so every retry
+    mails the same bytes; the copy is removed once the record is sent or dead.
+    """
+
+    def __init__(self, db_path="outbox.db", max_attempts=8, base_delay=2.0, max_delay=600.0, attachment_dir=".outbox_attachments"):
+        self.db_path = db_path
+        self.attachment_dir = attachment_dir
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.wakeup = threading.Event()  # set on enqueue so the worker does not wait for its poll interval
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, recipient TEXT, subject TEXT, body TEXT, attachment TEXT, "
+            "status TEXT DEFAULT 'pending', attempts INTEGER DEFAULT 0, created_at REAL, next_attempt_at REAL, "
+            "sent_at REAL, last_error TEXT)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)")
+        self.conn.commit()
+
+    def _insert(self, recipient, subject, body, attachment=None):
+        # caller holds the lock and commits, so a digest flush is one transaction
+        now = time.time()
+        return self.conn.execute(
+            "INSERT INTO outbox (recipient, subject, body, attachment, created_at, next_attempt_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (recipient, subject, body, attachment, now, now),
+        ).lastrowid
+
+    def enqueue(self, recipient, subject, body, attachment=None):
+        attachment = keep_copy(attachment, self.attachment_dir)
+        with self._lock:
+            record_id = self._insert(recipient, subject, body, attachment)
+            self.conn.commit()
+        self.wakeup.set()
+        return record_id
+
+    def due(self, limit=50):
+        with self._lock:
+            return self.conn.execute(
+                "SELECT id, recipient, subject, body, attachment, attempts, created_at FROM outbox "
+                "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (time.time(), limit),
+            ).fetchall()
+
+    def _release_attachment(self, record_id):
+        # caller holds the lock; only copies made by `enqueue`, digest bundles are removed by the digest
+        row = self.conn.execute("SELECT attachment FROM outbox WHERE id = ?", (record_id,)).fetchone()
+        root = os.path.abspath(self.attachment_dir)
+        if row and row[0] and os.path.abspath(row[0]).startswith(root + os.sep):
+            remove_copy(row[0])
+
+    def mark_sent(self, record_id):
+        with self._lock:
+            self.conn.execute("UPDATE outbox SET status = 'sent', sent_at = ? WHERE id = ?", (time.time(), record_id))
+            self.conn.commit()
+            self._release_attachment(record_id)
+
+    def mark_failed(self, record_id, attempts, error):
+        attempts += 1
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+        status = 'dead' if attempts >= self.max_attempts else 'pending'
+        with self._lock:
+            self.conn.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (status, attempts, time.time() + delay, str(error), record_id),
+            )
+            self.conn.commit()
+            if status == 'dead':
+                self._release_attachment(record_id)
+        return status
+
+    def depth(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    def next_due_in(self):
+        with self._lock:
+            row = self.conn.execute("SELECT MIN(next_attempt_at) FROM outbox WHERE status = 'pending'").fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+
+    def pending_attachments(self):
+        with self._lock:
+            return {row[0] for row in self.conn.execute(
+                "SELECT attachment FROM outbox WHERE status = 'pending' AND attachment IS NOT NULL")}
+
+
+DIGEST_STATUS = {0: "empty", 1: "incomplete rows", 2: "clean"}
+
+
+# NotificationDigest coalesces file results into one email per recipient and window
+class NotificationDigest:
+    """Per-recipient digest of classification results, kept in the outbox database.
+
+    `add` only records a file's result. Once a recipient's oldest result is
+    `window_seconds` old or `max_files` results have piled up, `flush` turns them
+    into one outbox notification: a status table of every file plus a single zip
+    of their revised splits. `add` copies the split under `bundle_dir`, so a file
+    resent within the window cannot overwrite the earlier version before it is
+    bundled. The zip is written by streaming those copies from disk; the copies
+    go once they are bundled, the zip once its notification is no longer pending.
+    """
+
+    def __init__(self, outbox, window_seconds=900.0, max_files=100, bundle_dir=".digests"):
+        self.outbox = outbox
+        self.window_seconds = window_seconds
+        self.max_files = max_files
+        self.bundle_dir = bundle_dir
+        with outbox._lock:
+            outbox.conn.execute(
+                "CREATE TABLE IF NOT EXISTS digest_items ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, recipient TEXT, filename TEXT, data_status INTEGER, "
+                "records INTEGER, content TEXT, attachment TEXT, created_at REAL)"
+            )
+            outbox.conn.execute("CREATE INDEX IF NOT EXISTS digest_recipient ON digest_items (recipient, id)")
+            outbox.conn.commit()
+
+    def add(self, recipient, filename, data_status, records, content, attachment=None):
+        attachment = keep_copy(attachment, os.path.join(self.bundle_dir, "items"))
+        with self.outbox._lock:
+            self.outbox.conn.execute(
+                "INSERT INTO digest_items (recipient, filename, data_status, records, content, attachment, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (recipient, filename, data_status, records, content, attachment, time.time()),
+            )
+            self.outbox.conn.commit()
+        self.outbox.wakeup.set()  # the worker re-checks whether the count window is full
+
+    def _recipients_due(self, force):
+        with self.outbox._lock:
+            rows = self.outbox.conn.execute(
+                "SELECT recipient, COUNT(*), MIN(created_at) FROM digest_items GROUP BY recipient").fetchall()
+        now = time.time()
+        return [recipient for recipient, count, oldest in rows
+                if force or count >= self.max_files or now - oldest >= self.window_seconds]
+
+    def next_due_in(self):
+        with self.outbox._lock:
+            oldest = self.outbox.conn.execute("SELECT MIN(created_at) FROM digest_items").fetchone()[0]
+        return None if oldest is None else max(0.0, oldest + self.window_seconds - time.time())
+
+    def _bundle(self, recipient, items):
+        attachments = [(filename, path) for _, filename, _, _, _, path in items if path and os.path.isfile(path)]
+        if not attachments:
+            return None
+        os.makedirs(self.bundle_dir, exist_ok=True)
+        safe_recipient = "".join(c if c.isalnum() else "_" for c in recipient or "unknown")
+        bundle_path = os.path.join(self.bundle_dir, f"revised_{safe_recipient}_{items[0][0]}-{items[-1][0]}.zip")
+        names = set()
+        with zipfile.ZipFile(bundle_path + ".part", 'w', compression=zipfile.ZIP_DEFLATED) as bundle:
+            for filename, path in attachments:
+                name = os.path.basename(path)
+                base, ext = os.path.splitext(name)
+                n = 1
+                while name in names:  # the same file resent within one window
+                    n += 1
+                    name = f"{base}_{n}{ext}"
+                names.add(name)
+                bundle.write(path, arcname=name)  # copied in blocks, never read whole
+        os.replace(bundle_path + ".part", bundle_path)
+        return bundle_path
+
+    @staticmethod
+    def _body(items, bundled):
+        width = max(len("File"), *(len(filename) for _, filename, _, _, _, _ in items))
+        lines = [f"{len(items)} file(s) have been processed.", "",
+                 f"{'File':<{width}}  {'Status':<15}  {'Records':>8}  Details",
+                 f"{'-' * width}  {'-' * 15}  {'-' * 8}  {'-' * 7}"]
+        for _, filename, data_status, records, content, _ in items:
+            lines.append(f"{filename:<{width}}  {DIGEST_STATUS.get(data_status, data_status):<15}  {records if records is not None else '':>8}  {content}")
+        if bundled:
+            lines += ["", "The revised files (rows that still need data) are attached as one zip."]
+        return "\n".join(lines)
+
+    def flush(self, force=False):
+        """Queue the digest of every recipient whose window is over, returns how many were queued."""
+        queued = 0
+        for recipient in self._recipients_due(force):
+            with self.outbox._lock:
+                items = self.outbox.conn.execute(
+                    "SELECT id, filename, data_status, records, content, attachment FROM digest_items "
+                    "WHERE recipient = ? ORDER BY id LIMIT ?", (recipient, self.max_files)).fetchall()
+            if not items:
+                continue
+            try:
+                bundle_path = self._bundle(recipient, items)
+            except OSError as e:  # still send the table, the splits stay in Revised/
+                logger.error(f"Digest bundle for {recipient} failed: {e}")
+                bundle_path = None
+            subject = f"File Check Digest: {len(items)} file(s)"
+            with self.outbox._lock:
+                self.outbox._insert(recipient, subject, self._body(items, bundle_path is not None), bundle_path)
+                self.outbox.conn.executemany("DELETE FROM digest_items WHERE id = ?", [(item[0],) for item in items])
+                self.outbox.conn.commit()
+            for *_, path in items:  # bundled, or the bundle failed and the table went out without them
+                remove_copy(path)
+            queued += 1
+            logger.info(f"Digest of {len(items)} file(s) queued for {recipient}")
+        if queued:
+            self.outbox.wakeup.set()
+        self._remove_sent_bundles()
+        return queued
+
+    def _remove_sent_bundles(self):
+        if not os.path.isdir(self.bundle_dir):
+            return
+        pending = {os.path.abspath(path) for path in self.outbox.pending_attachments()}
+        for name in os.listdir(self.bundle_dir):
+            path = os.path.abspath(os.path.join(self.bundle_dir, name))
+            if name.endswith(".zip") and path not in pending:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+# OutboxWorker drains the outbox in the background
+class OutboxWorker(threading.Thread):
+    def __init__(self, outbox, transport=None, poll_interval=30.0, batch_size=50, digest=None):
+        super().__init__(name="outbox-worker", daemon=True)
+        self.outbox = outbox
+        self.digest = digest  # NotificationDigest, flushed before every drain
+        self.transport = transport
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.sent = 0
+        self.failed = 0
+        self.send_latencies = deque(maxlen=1000)  # seconds per successful SMTP send
+        self.delivery_latencies = deque(maxlen=1000)  # seconds from enqueue to delivery
+        self._stop_event = threading.Event()
+
+    def drain(self):
+        """Send every notification that is due, returns how many were attempted."""
+        if self.digest is not None:
+            self.digest.flush()
+        rows = self.outbox.due(self.batch_size)
+        transport = self.transport or get_transport()
+        for record_id, recipient, subject, body, attachment, attempts, created_at in rows:
+            start = time.perf_counter()
+            try:
+                transport.send(build_message(recipient, subject, body, attachment), [recipient])
+            except Exception as e:
+                self.failed += 1
+                status = self.outbox.mark_failed(record_id, attempts, e)
+                logger.error(f"Outbox notification {record_id} to {recipient} failed ({status}): {e}")
+                continue
+            self.send_latencies.append(time.perf_counter() - start)
+            self.delivery_latencies.append(time.time() - created_at)
+            self.outbox.mark_sent(record_id)
+            self.sent += 1
+            logger.info(f"Outbox delivered notification {record_id}: {subject}")
+        return len(rows)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.outbox.wakeup.clear()
+            try:
+                attempted = self.drain()
+            except Exception as e:  # e.g. database locked, try again on the next pass
+                logger.error(f"OutboxWorker error: {e}")
+                attempted = 0
+            if attempted >= self.batch_size:
+                continue
+            next_due = self.outbox.next_due_in()
+            digest_due = self.digest.next_due_in() if self.digest is not None else None
+            if digest_due is not None:
+                next_due = digest_due if next_due is None else min(next_due, digest_due)
+            timeout = self.poll_interval if next_due is None else min(self.poll_interval, next_due)
+            self.outbox.wakeup.wait(timeout)
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        self.outbox.wakeup.set()
+        self.join(timeout)
+
+    def metrics(self):
+        latencies = sorted(self.send_latencies)
+
+        def percentile(q):
+            return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else None
+
+        return {
+            "queue_depth": self.outbox.depth(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "send_latency_p50": percentile(0.50),
+            "send_latency_p99": percentile(0.99),
+            "delivery_latency_max": max(self.delivery_latencies) if self.delivery_latencies else None,
+        }
@@ -0,0 +1,80 @@
+from typing import Annotated, Any, TypedDict
+from langgraph.graph import StateGraph, END, START
+from Updated_Agent import WatchdogAgent,ClassifierAgent,PreprocessingAgent
+from Updated_Agent import AsyncWatchdogAgent,AsyncClassifierAgent,AsyncPreprocessingAgent
+from Pipeline_Metrics import instrument
+
+
+class PipelineState:
+    def __init__(self, reports=None, watchdog_state=None, next=None, classifier_state=None, preprocessing_state =None, trigger_files=None):
+        self.reports = reports or []
+        self.trigger_files = trigger_files or []
+        self.watchdog_state = watchdog_state
+        self.classifier_state = classifier_state
+        self.preprocessing_state = preprocessing_state
+        self.next = next
+
+    def to_dict(self):
+        return {
+            "reports": self.reports,
+            "watchdog_state": self.watchdog_state,
+            "classifier_state": self.classifier_state,
+            "preprocessing_state":self.preprocessing_state,
+            "next":self.next,
+            "trigger_files":self.trigger_files
+        }
+
+
+def append_list(current, update):
+    # reducer for list channels: concurrent or repeated writes are concatenated,
+    # so no writer replaces another's items
+    return (current or []) + (update or [])
+
+
+# Graph state schema: one channel per key and every node returns only the keys it
+# owns, so the classifier and preprocessing branches never overwrite each other.
+# Reports are small dicts of paths and ArtifactStore handles, the frames
+# themselves never enter the state (or its checkpoints).
+class PipelineGraphState(TypedDict, total=False):
+    reports: Annotated[list, append_list]  # WatchdogAgent
+    trigger_files: list
+    watchdog_state: str
+    classifier_state: str
+    preprocessing_state: str
+    content: Annotated[list, append_list]  # ClassifierAgent
+    next: Any  # WatchdogAgent only, read by should_continue
+
+
+# Route on the WatchdogAgent's 'next': fan out only when a new file was checked
+def should_continue(state):
+    next_nodes = state.get("next")
+    return next_nodes if isinstance(next_nodes, list) else END
+
+
+# Build the graph
+def build_graph(folder_path, ledger=None, outbox=None, batch=True, chunksize=None, output_format="csv", async_nodes=False, result_cache=None,
+                recipients=None, updated_root="Updated", revised_root="Revised", pool=None, checkpointer=None, incremental=False, digest=None):
+    if async_nodes: # for ainvoke/astream, blocking work runs in threads
+        watchdog_agent, classifier_agent, preprocessing_agent = AsyncWatchdogAgent, AsyncClassifierAgent, AsyncPreprocessingAgent
+    else:
+        watchdog_agent, classifier_agent, preprocessing_agent = WatchdogAgent, ClassifierAgent, PreprocessingAgent
+
+    graph = StateGraph(state_schema=PipelineGraphState)
+
+    # every node is wrapped to record wall/CPU time, rows and bytes
+    graph.add_node("watchdog", instrument("watchdog", watchdog_agent(folder_path=folder_path, ledger=ledger, batch=batch, chunksize=chunksize, output_format=output_format, result_cache=result_cache,
+                                                                updated_root=updated_root, revised_root=revised_root, pool=pool,
+                                                                incremental=incremental, defer_ledger=checkpointer is not None), async_nodes))
+    graph.add_node("classifier", instrument("classifier", classifier_agent(outbox=outbox, recipients=recipients, digest=digest), async_nodes))
+    graph.add_node("preprocessing", instrument("preprocessing", preprocessing_agent(chunksize=chunksize), async_nodes))
+
+    # Set entry point
+    graph.add_edge(START,"watchdog")
+
+    # Define edges (based on your WatchdogAgent's 'next')
+    graph.add_conditional_edges("watchdog", should_continue, ["classifier", "preprocessing", END])
+
+    graph.add_edge("classifier", END)
+    graph.add_edge("preprocessing", END)
+    # with a checkpointer every step is saved per thread, see Run_Checkpoints.run_thread
+    return graph.compile(checkpointer=checkpointer)
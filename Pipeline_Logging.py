@@ -0,0 +1,132 @@
+import os
+import gzip
+import json
+import time
+import atexit
+import random
+import shutil
+import queue
+import logging
+import multiprocessing
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+
+from Pipeline_Metrics import current_run
+
+LOG_PATH = os.getenv("LOG_PATH", "pipeline_run.log")  # JSON lines, appended to across restarts
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_MAX_MB = int(os.getenv("LOG_MAX_MB", "50"))  # size-based rotation
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "")  # e.g. "midnight" or "H" rotates by time instead of size
+LOG_BACKUPS = int(os.getenv("LOG_BACKUPS", "14"))  # rotated files kept, gzip-compressed
+DEBUG_SAMPLE_RATE = float(os.getenv("DEBUG_SAMPLE_RATE", "0.1"))  # share of DEBUG records kept when LOG_LEVEL=DEBUG
+
+_listeners = []
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record, with the run it belongs to."""
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "run_id": getattr(record, "run_id", None),
+            "tenant": getattr(record, "tenant", None),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RunContextFilter(logging.Filter):
+    # handler filters run in the thread that logs, where the run's contextvar is visible
+    def filter(self, record):
+        run = current_run()
+        record.run_id = run["run_id"] if run else None
+        record.tenant = run.get("tenant") if run else None
+        return True
+
+
+class DebugSampler(logging.Filter):
+    def __init__(self, rate=DEBUG_SAMPLE_RATE):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+class _PipelineQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # merge the arguments so the record pickles to a worker queue, and keep the
+        # traceback as text in its own field; done in place rather than format + copy
+        # like the stock QueueHandler, any other handler still sees the same message
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _gzip_name(name):
+    return name + ".gz"
+
+
+def _gzip_rotate(source, dest):
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def setup_logging(path=LOG_PATH, level=LOG_LEVEL, max_mb=LOG_MAX_MB, when=LOG_ROTATE_WHEN, backups=LOG_BACKUPS,
+                  debug_sample_rate=DEBUG_SAMPLE_RATE):
+    """Route every logger through a queue to one rotating JSON-lines file.
+
+    Threads that log only put the record on an in-process queue; a
+    QueueListener thread formats it and does the disk writes, rotation and gzip
+    compression of the rotated file. Process-pool workers, forked with the
+    handler in place, are switched to a multiprocessing queue that a second
+    listener drains into the same file, so they never race the parent on it.
+    Every record carries the run_id and tenant of the `track_run` it was logged
+    in, the same run_id as in pipeline_runs.jsonl. Safe to call more than once.
+    """
+    if _listeners:
+        return
+    if when:
+        handler = TimedRotatingFileHandler(path, when=when, backupCount=backups, encoding="utf-8")
+    else:
+        handler = RotatingFileHandler(path, maxBytes=max_mb * 1024 * 1024, backupCount=backups, encoding="utf-8")
+    handler.namer = _gzip_name
+    handler.rotator = _gzip_rotate
+    handler.setFormatter(JsonLinesFormatter())
+
+    local_queue, worker_queue = queue.SimpleQueue(), multiprocessing.Queue()  # the latter only pickles in workers
+    queue_handler = _PipelineQueueHandler(local_queue)
+    queue_handler.addFilter(DebugSampler(debug_sample_rate))
+    queue_handler.addFilter(RunContextFilter())
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+
+    def use_worker_queue():
+        queue_handler.queue = worker_queue
+        _listeners.clear()  # the parent's listener threads do not exist in the child
+    os.register_at_fork(after_in_child=use_worker_queue)
+
+    _listeners.extend(QueueListener(q, handler) for q in (local_queue, worker_queue))
+    for listener in _listeners:
+        listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Flush what is still queued and close the file."""
+    for listener in _listeners:
+        listener.stop()
+    for handler in {handler for listener in _listeners for handler in listener.handlers}:
+        handler.close()
+    _listeners.clear()
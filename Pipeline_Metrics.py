@@ -0,0 +1,307 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_run = contextvars.ContextVar("current_run", default=None)
+_nodes_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+# MetricsRegistry holds Prometheus-style counters and histograms
+class MetricsRegistry:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+        self._help = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def inc(self, name, value=1.0, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            series = self._histograms.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def get(self, name, **labels):
+        return self._counters.get(self._key(name, labels), 0.0)
+
+    @staticmethod
+    def _format_labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+    def render(self):
+        """Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{self._format_labels(labels)} {value}")
+        for (name, labels), series in histograms:
+            if name not in seen:
+                seen.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{name}_bucket{self._format_labels(labels, [('le', bound)])} {count}")
+            lines.append(f"{name}_bucket{self._format_labels(labels, [('le', '+Inf')])} {series[-1]}")
+            lines.append(f"{name}_sum{self._format_labels(labels)} {series[-2]}")
+            lines.append(f"{name}_count{self._format_labels(labels)} {series[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+registry.describe("pipeline_node_wall_seconds", "Wall time per graph node run")
+registry.describe("pipeline_node_cpu_seconds_total", "CPU time spent in graph nodes")
+registry.describe("pipeline_rows_processed_total", "Rows read from drop files")
+registry.describe("pipeline_bytes_read_total", "Bytes of drop files read")
+registry.describe("pipeline_bytes_written_total", "Bytes written to Updated/ and Revised/")
+registry.describe("smtp_send_seconds", "Latency of one SMTP send")
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return 0
+
+
+def _io_stats(update):
+    """Rows and bytes moved by a node, taken from the reports it returned.
+
+    A source is read once however many reports it gave (workbook sheets, zip
+    members), and not at all when the reports came from the ResultCache.
+    """
+    rows = bytes_read = bytes_written = 0
+    sources = set()
+    reports = update.get("reports") if isinstance(update, dict) else None
+    for report in reports or []:
+        rows += report.get("records") or 0
+        source = report.get("source_path")
+        if source not in sources and not report.get("cache_hit"):
+            sources.add(source)
+            bytes_read += _file_size(source)
+        for key in ("file_path", "revised_file_path"):
+            if report.get(key) and report.get(key) != source:
+                bytes_written += _file_size(report[key])
+    return rows, bytes_read, bytes_written
+
+
+def _reset_peak_rss():
+    """Start a new resident memory high-water mark, False where the OS cannot (Linux only)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")  # resets VmHWM to the current RSS
+        return True
+    except OSError:
+        return False
+
+
+def _status_kb(field):
+    # "VmRSS" (current) or "VmHWM" (high-water mark) from /proc/self/status, in KiB
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _node_started():
+    """RSS in KiB as the node starts, None where the peak cannot be measured per node.
+
+    The high-water mark is process-wide, so it is only reset when no other node
+    is running: nodes that overlap (parallel branches, concurrent runs) share
+    one peak rather than hide one.
+    """
+    global _nodes_in_flight
+    with _in_flight_lock:
+        measurable = _nodes_in_flight > 0 or _reset_peak_rss()
+        _nodes_in_flight += 1
+    return _status_kb("VmRSS") if measurable else None
+
+
+def _node_finished(start_rss_kb):
+    """(peak RSS, growth over the RSS the node started with) in KiB, Nones where not measurable."""
+    global _nodes_in_flight
+    with _in_flight_lock:
+        _nodes_in_flight -= 1
+    peak = _status_kb("VmHWM") if start_rss_kb is not None else None
+    return peak, max(0, peak - start_rss_kb) if peak is not None else None
+
+
+def _record_node(name, wall, cpu, update, failed, rss_kb=(None, None)):
+    rows, bytes_read, bytes_written = _io_stats(update)
+    state_value = update.get(f"{name}_state") if isinstance(update, dict) else None
+    failed = failed or (isinstance(state_value, str) and state_value.startswith("error"))
+    registry.inc("pipeline_node_runs_total", node=name)
+    if failed:
+        registry.inc("pipeline_node_errors_total", node=name)
+    registry.observe("pipeline_node_wall_seconds", wall, node=name)
+    registry.inc("pipeline_node_cpu_seconds_total", cpu, node=name)
+    registry.inc("pipeline_rows_processed_total", rows, node=name)
+    registry.inc("pipeline_bytes_read_total", bytes_read, node=name)
+    registry.inc("pipeline_bytes_written_total", bytes_written, node=name)
+    run = _current_run.get()
+    if run is not None:
+        run["nodes"][name] = {"wall_seconds": round(wall, 6), "cpu_seconds": round(cpu, 6), "rows": rows,
+                              "bytes_read": bytes_read, "bytes_written": bytes_written, "failed": failed,
+                              "max_rss_kb": rss_kb[0], "rss_growth_kb": rss_kb[1]}
+
+
+def record_smtp_send(seconds):
+    registry.observe("smtp_send_seconds", seconds)
+    run = _current_run.get()
+    if run is not None:
+        run["smtp_seconds"].append(round(seconds, 6))
+
+
+# InstrumentedNode wraps a graph node and records its timings and I/O
+class InstrumentedNode:
+    def __init__(self, name, node):
+        self.name = name
+        self.node = node
+
+    def __call__(self, state):
+        wall, cpu = time.perf_counter(), time.thread_time()  # LangGraph runs parallel branches in threads
+        update, failed, rss = None, True, _node_started()
+        try:
+            update = self.node(state)
+            failed = False
+            return update
+        finally:
+            _record_node(self.name, time.perf_counter() - wall, time.thread_time() - cpu, update, failed, _node_finished(rss))
+
+
+class AsyncInstrumentedNode(InstrumentedNode):
+    async def __call__(self, state):
+        # async nodes do their work in other threads, so CPU time here is process-wide
+        wall, cpu = time.perf_counter(), time.process_time()
+        update, failed, rss = None, True, _node_started()
+        try:
+            update = await self.node(state)
+            failed = False
+            return update
+        finally:
+            _record_node(self.name, time.perf_counter() - wall, time.process_time() - cpu, update, failed, _node_finished(rss))
+
+
+def instrument(name, node, async_node=False):
+    return AsyncInstrumentedNode(name, node) if async_node else InstrumentedNode(name, node)
+
+
+# RunRecorder appends one JSON line per pipeline run
+class RunRecorder:
+    def __init__(self, path="pipeline_runs.jsonl"):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record, default=str)
+        with self._lock, open(self.path, 'a') as f:
+            f.write(line + "\n")
+
+
+def current_run():
+    """The run record of the graph invocation in progress on this context, None outside `track_run`."""
+    return _current_run.get()
+
+
+def run_context():
+    """run_id and tenant of the current run, for `in_run` in a pool worker; None outside `track_run`."""
+    run = _current_run.get()
+    return {"run_id": run["run_id"], "tenant": run.get("tenant")} if run is not None else None
+
+
+def in_run(context, fn, *args):
+    """fn(*args) as part of the run `context` was taken from, so a pool worker's log records carry its run_id."""
+    token = _current_run.set(context)
+    try:
+        return fn(*args)
+    finally:
+        _current_run.reset(token)
+
+
+@contextmanager
+def track_run(recorder=None, **fields):
+    """Collect every node's numbers for one graph invocation into a single run record."""
+    run = {"run_id": uuid.uuid4().hex, "started_at": time.time(), "nodes": {}, "smtp_seconds": [], **fields}
+    token = _current_run.set(run)
+    start = time.perf_counter()
+    try:
+        yield run
+    except Exception as e:
+        run["error"] = str(e)
+        raise
+    finally:
+        run["wall_seconds"] = round(time.perf_counter() - start, 6)
+        _current_run.reset(token)
+        registry.inc("pipeline_runs_total", status="error" if "error" in run else "ok")
+        registry.observe("pipeline_run_seconds", run["wall_seconds"])
+        if recorder is not None:
+            try:
+                recorder.write(run)
+            except OSError as e:
+                logger.error(f"RunRecorder could not write run record: {e}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # keep scrapes out of the pipeline log
+        pass
+
+
+def start_metrics_server(port=9108, host="127.0.0.1"):
+    """Serve /metrics on a local port from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    return server
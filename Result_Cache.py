@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import shutil
+import logging
+import sqlite3
+import threading
+
+from Pipeline_Metrics import registry
+
+logger = logging.getLogger(__name__)
+
+registry.describe("result_cache_hits_total", "Drop files answered from the content-hash result cache")
+registry.describe("result_cache_misses_total", "Drop files that had to be validated and split")
+registry.describe("result_cache_bytes_saved_total", "Bytes of drop files not re-parsed thanks to the result cache")
+
+OUTPUT_KEYS = ("file_path", "revised_file_path")
+
+
+def _stem(file_name):
+    return file_name.split('.')[0]
+
+
+# ResultCache reuses the reports and splits of content that was already validated
+class ResultCache:
+    """Content-addressed cache of WatchdogAgent results, keyed by the file's hash.
+
+    An entry holds the reports for one drop file plus a copy of every split it
+    wrote. A re-sent file with the same bytes (under any name or in another
+    folder) gets its splits copied to the outputs for its own name instead of
+    being parsed again. `variant` separates results that depend on settings
+    (output format, streaming, sheet selection). Entries are evicted least
+    recently used first once the stored splits exceed `max_bytes`.
+    """
+
+    def __init__(self, cache_dir=".result_cache", max_bytes=1 << 30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(cache_dir, "index.db"), check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, reports TEXT, size INTEGER, created_at REAL, last_used REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_used)")
+        self.conn.commit()
+
+    @staticmethod
+    def key(content_hash, variant=""):
+        return f"{content_hash}-{variant}" if variant else content_hash
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key, file_path, roots=None):
+        """Reports for `file_path` rebuilt from a cached entry, or None on a miss.
+
+        `roots` maps "file_path"/"revised_file_path" to the output roots of the
+        caller, so content first seen by another tenant lands in this one's folders.
+        """
+        with self._lock:
+            row = self.conn.execute("SELECT reports FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+                self.conn.commit()
+        if row is None:
+            self.misses += 1
+            registry.inc("result_cache_misses_total")
+            return None
+        try:
+            reports = self._restore(key, json.loads(row[0]), file_path, roots or {})
+        except OSError as e: # blob evicted or removed underneath us, treat as a miss
+            logger.warning(f"ResultCache entry {key} unusable, recomputing: {e}")
+            self.discard(key)
+            self.misses += 1
+            registry.inc("result_cache_misses_total")
+            return None
+        size = os.path.getsize(file_path)
+        self.hits += 1
+        self.bytes_saved += size
+        registry.inc("result_cache_hits_total")
+        registry.inc("result_cache_bytes_saved_total", size)
+        return reports
+
+    def _restore(self, key, cached_reports, file_path, roots):
+        file_name, stem = os.path.basename(file_path), _stem(os.path.basename(file_path))
+        reports = []
+        for cached in cached_reports:
+            report = dict(cached["report"], file=file_name, source_path=file_path, artifact=None, cache_hit=True) # not read again, see Pipeline_Metrics
+            for out_key, out in cached["outputs"].items():
+                if out is None or out == "source": # clean CSVs point at the drop file itself
+                    report[out_key] = None if out is None else file_path
+                    continue
+                folder = os.path.join(roots.get(out_key, out["root"]), stem + out["folder"])
+                os.makedirs(folder, exist_ok=True)
+                target = os.path.join(folder, stem + out["name"])
+                shutil.copyfile(os.path.join(self._entry_dir(key), out["blob"]), target) # a copy, later writes must not touch the cache
+                report[out_key] = target
+            reports.append(report)
+        return reports
+
+    def put(self, key, file_path, reports):
+        """Store the reports and a copy of their splits, then evict down to `max_bytes`."""
+        stem = _stem(os.path.basename(file_path))
+        entry_dir = self._entry_dir(key)
+        cached_reports, size = [], 0
+        try:
+            os.makedirs(entry_dir, exist_ok=True)
+            for i, report in enumerate(reports):
+                outputs = {}
+                for out_key in OUTPUT_KEYS:
+                    if out_key not in report: # empty files have no outputs at all
+                        continue
+                    path = report[out_key]
+                    if not path:
+                        outputs[out_key] = None
+                    elif path == report.get("source_path"):
+                        outputs[out_key] = "source"
+                    else:
+                        folder, name = os.path.basename(os.path.dirname(path)), os.path.basename(path)
+                        if not (folder.startswith(stem) and name.startswith(stem)):
+                            raise ValueError(f"unexpected output path {path}")
+                        blob = f"{i}-{out_key}{os.path.splitext(path)[1]}"
+                        shutil.copyfile(path, os.path.join(entry_dir, blob))
+                        size += os.path.getsize(path)
+                        outputs[out_key] = {"root": os.path.dirname(os.path.dirname(path)), "folder": folder[len(stem):],
+                                            "name": name[len(stem):], "blob": blob}
+                plain = {k: v for k, v in report.items() if k not in ("artifact", "source_path", "file") + OUTPUT_KEYS}
+                cached_reports.append({"report": plain, "outputs": outputs})
+        except (OSError, ValueError) as e:
+            logger.warning(f"ResultCache could not store {file_path}: {e}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, reports, size, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(cached_reports), size, now, now),
+            )
+            self.conn.commit()
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            evicted = []
+            for key, size in self.conn.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+                if total <= self.max_bytes:
+                    break
+                evicted.append(key)
+                total -= size
+            self.conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in evicted])
+            self.conn.commit()
+        for key in evicted:
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+        logger.info(f"ResultCache evicted {len(evicted)} entr{'y' if len(evicted) == 1 else 'ies'}")
+
+    def discard(self, key):
+        with self._lock:
+            self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self.conn.commit()
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": self.hits / total if total else 0.0,
+                "bytes_saved": self.bytes_saved}
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,80 @@
+import os
+import logging
+import sqlite3
+
+from File_Ledger import file_digest
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TENANT = "default"
+
+
+def open_checkpointer(db_path="checkpoints.db"):
+    """Local SQLite checkpointer for the compiled graph, None when the package is not installed."""
+    try:
+        from langgraph.checkpoint.sqlite import SqliteSaver
+    except ImportError:  # langgraph-checkpoint-sqlite is optional, runs are then not resumable
+        logger.warning("langgraph-checkpoint-sqlite is not installed, pipeline runs will not be resumable")
+        return None
+    saver = SqliteSaver(sqlite3.connect(db_path, check_same_thread=False))
+    saver.setup()
+    return saver
+
+
+def has_open_threads(db_path="checkpoints.db"):
+    """Cheap check straight on the SQLite file, so an idle cron run does not import LangGraph."""
+    if not os.path.exists(db_path):
+        return False
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT 1 FROM checkpoints LIMIT 1").fetchone() is not None
+    except sqlite3.OperationalError: # created but never set up
+        return False
+    finally:
+        conn.close()
+
+
+def thread_id_for(path, tenant=None, content_hash=None):
+    # one thread per tenant, file and content, so a re-sent file with new bytes starts over
+    return f"{tenant or DEFAULT_TENANT}|{os.path.abspath(path)}@{content_hash or file_digest(path)}"
+
+
+def tenant_of(thread_id):
+    tenant = thread_id.split("|", 1)[0]
+    return None if tenant == DEFAULT_TENANT else tenant
+
+
+def open_threads(checkpointer):
+    """Thread ids that still have checkpoints, i.e. runs that have not finished.
+
+    Finished threads are deleted by `run_thread`, so anything left here was
+    interrupted by a crash or a failing node.
+    """
+    seen = []
+    for checkpoint in checkpointer.list(None):
+        thread_id = checkpoint.config["configurable"]["thread_id"]
+        if thread_id not in seen:
+            seen.append(thread_id)
+    return seen
+
+
+def run_thread(app, checkpointer, thread_id, initial_state):
+    """Run one file's pipeline as a checkpointed LangGraph thread.
+
+    A thread that stopped part-way resumes from its last checkpoint: nodes that
+    already completed (including a parallel branch that finished in the failing
+    step) are not executed again, so the watchdog does not re-read the file and
+    the classifier does not email twice. The thread is deleted once it has run
+    to the end; the FileLedger remembers the file from then on.
+    """
+    config = {"configurable": {"thread_id": thread_id}}
+    snapshot = app.get_state(config)
+    if snapshot.next:
+        logger.info(f"Resuming {thread_id} at {list(snapshot.next)}")
+        result = app.invoke(None, config)
+    elif snapshot.values: # finished but not cleaned up, e.g. crashed right before delete_thread
+        result = snapshot.values
+    else:
+        result = app.invoke(initial_state, config)
+    checkpointer.delete_thread(thread_id)
+    return result
@@ -0,0 +1,218 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+from contextlib import nullcontext
+
+try:
+    import pyarrow  # noqa: F401  needed for engine="pyarrow"
+    HAVE_PYARROW = True
+except ImportError:
+    HAVE_PYARROW = False
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_PROFILE_DIR = os.getenv("SCHEMA_PROFILE_DIR", ".schema_profiles")  # empty disables typed parsing
+CSV_ENGINE = os.getenv("CSV_ENGINE", "c")  # "pyarrow" for the multithreaded Arrow CSV reader on in-memory reads
+SAMPLE_ROWS = int(os.getenv("SCHEMA_SAMPLE_ROWS", "10000"))
+CATEGORY_RATIO = 0.5  # object columns with at most this share of distinct values become category
+
+_profiles = {}  # source -> profile, per process
+
+
+def source_key(file_path):
+    """Files from one source share a profile: `/srv/bank_a/incoming/Partial_20240105.csv` -> `srv_bank_a_incoming-Partial`.
+
+    The whole folder path is in the key, tenants whose drop folders share a
+    name (`/srv/bank_a/incoming`, `/srv/bank_b/incoming`) keep apart profiles.
+    """
+    folder = re.sub(r'[^0-9A-Za-z.]+', '_', os.path.dirname(os.path.abspath(file_path))).strip('_')
+    stem = os.path.basename(file_path).split('.')[0]
+    return f"{folder}-{re.sub(r'[-_ ]*[0-9][-_ 0-9]*$', '', stem) or stem}"
+
+
+def _column_dtype(series):
+    non_null = series.dropna()
+    if non_null.empty:  # nothing to learn from, leave it to inference
+        return None
+    if pd.api.types.is_bool_dtype(series):
+        return "boolean"
+    if pd.api.types.is_integer_dtype(series):
+        return "Int64"
+    if pd.api.types.is_float_dtype(series):
+        # whole numbers upcast to float only because of nulls, e.g. column A in Partial.csv
+        return "Int64" if (non_null % 1 == 0).all() and non_null.abs().max() < 2 ** 53 else "float64"
+    if pd.api.types.is_object_dtype(series) and non_null.nunique() <= max(1, CATEGORY_RATIO * len(non_null)):
+        return "category"
+    return None
+
+
+def learn_profile(sample):
+    """Declared dtypes (nullable Int64, float64, boolean, category) and required columns from a sample frame."""
+    dtypes = {name: dtype for name, dtype in ((name, _column_dtype(series)) for name, series in sample.items()) if dtype}
+    return {"dtypes": dtypes, "required": list(sample.columns), "engine": "pyarrow" if CSV_ENGINE == "pyarrow" and HAVE_PYARROW else "c"}
+
+
+def _profile_path(source):
+    return os.path.join(SCHEMA_PROFILE_DIR, f"{source}.json")
+
+
+def load_profile(source):
+    if source in _profiles:
+        return _profiles[source]
+    try:
+        with open(_profile_path(source)) as f:
+            _profiles[source] = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return _profiles[source]
+
+
+def save_profile(source, profile):
+    os.makedirs(SCHEMA_PROFILE_DIR, exist_ok=True)
+    tmp_path = f"{_profile_path(source)}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp_path, _profile_path(source))  # pool workers may learn the same source at once
+    _profiles[source] = profile
+
+
+def discard_profile(source):
+    _profiles.pop(source, None)
+    try:
+        os.remove(_profile_path(source))
+    except OSError:
+        pass
+
+
+def profile_fingerprint(profile_paths):
+    """Short hash of the profiles `profile_paths` are parsed with, "untyped" when profiles are off.
+
+    Read from the profile files rather than this process's cache: pool workers
+    relearn profiles, the parent only sees that on disk.
+    """
+    if not SCHEMA_PROFILE_DIR:
+        return "untyped"
+    h = hashlib.blake2b(digest_size=8)
+    for path in profile_paths:
+        try:
+            with open(_profile_path(source_key(path)), 'rb') as f:
+                h.update(f.read())
+        except OSError:  # not learned yet
+            pass
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _read(file_path, open_source=None, **kwargs):
+    # open_source() gives a decompressing stream for packed drops, see Compressed_Input
+    with (open_source() if open_source is not None else nullcontext(file_path)) as source:
+        return pd.read_csv(source, **kwargs)
+
+
+def profile_for(file_path, open_source=None):
+    """Cached profile of the file's source, learned from its first SAMPLE_ROWS rows the first time."""
+    if not SCHEMA_PROFILE_DIR:
+        return None
+    source = source_key(file_path)
+    profile = load_profile(source)
+    if profile is None:
+        profile = learn_profile(_read(file_path, open_source, nrows=SAMPLE_ROWS))
+        save_profile(source, profile)
+        logger.info(f"Learned schema profile for {source}: {profile['dtypes']}")
+    return profile
+
+
+def _parse_dtypes(profile):
+    # what the parser is told: everything for pyarrow, which builds the types natively; only
+    # category for the C parser, any numeric dtype declared to it costs more time than inferring
+    if profile.get("engine") == "pyarrow":
+        return dict(profile["dtypes"])
+    return {k: v for k, v in profile["dtypes"].items() if v == "category"}
+
+
+def _to_int64(series):
+    # float64 (an integer column with nulls) to Int64 straight from the null mask,
+    # astype("Int64") takes about as long as parsing the column
+    values = series.to_numpy()
+    mask = np.isnan(values)
+    whole = np.where(mask, 0, values)
+    ints = whole.astype(np.int64)
+    if not (ints == whole).all():
+        raise TypeError(f"column {series.name!r} has values that are not whole numbers")
+    return pd.Series(pd.arrays.IntegerArray(ints, mask), index=series.index, name=series.name)
+
+
+def read_options(profile, columns=None):
+    """pd.read_csv keyword arguments for a profile, limited to `columns` when given.
+
+    Category columns are declared to the parser, their strings are never held
+    as Python objects. The C parser is slower with numeric dtypes declared than
+    inferring them, so `apply_profile` fixes those columns that came out
+    differently instead; the pyarrow engine is given every dtype.
+    """
+    if profile is None:
+        return {}
+    options = {"dtype": {k: v for k, v in _parse_dtypes(profile).items() if columns is None or k in columns}}
+    if profile.get("usecols"):  # hand-edited profiles may drop columns the pipeline never needs
+        options["usecols"] = profile["usecols"]
+    return options
+
+
+def apply_profile(df, profile):
+    """Cast the numeric columns the C parser inferred differently from the profile; raises TypeError/ValueError on values that do not fit.
+
+    Integer columns without nulls already parse as int64 and are left alone.
+    """
+    if profile is None:
+        return df
+    parsed = _parse_dtypes(profile)
+    cast = {}
+    for name, dtype in profile["dtypes"].items():
+        if name not in df.columns or name in parsed:
+            continue
+        series = df[name]
+        if dtype == "Int64":
+            if pd.api.types.is_float_dtype(series):
+                cast[name] = _to_int64(series)
+            elif not pd.api.types.is_integer_dtype(series):
+                raise TypeError(f"column {name!r} is {series.dtype}, the profile declares Int64")
+        elif dtype == "float64" and not pd.api.types.is_float_dtype(series):
+            cast[name] = series.astype("float64") # whole numbers only in this file or chunk
+        elif dtype == "boolean" and not pd.api.types.is_bool_dtype(series):
+            cast[name] = series.astype("boolean")
+    return df.assign(**cast) if cast else df
+
+
+def missing_columns(profile, columns):
+    return [] if profile is None else [c for c in profile["required"] if c not in set(columns)]
+
+
+def read_csv_typed(file_path, open_source=None, **kwargs):
+    """pd.read_csv with the source's profile applied.
+
+    Returns (df, missing required columns). When the file does not fit the
+    profile (e.g. a decimal in an Int64 column) it is parsed untyped and the
+    profile is learned again from this file. Not for chunked reads, see
+    `read_options`. `open_source` reads from a stream instead, the profile is
+    still keyed on `file_path`.
+    """
+    profile = profile_for(file_path, open_source)
+    if profile is None:
+        return _read(file_path, open_source, **kwargs), []
+    header = _read(file_path, open_source, nrows=0).columns
+    missing = missing_columns(profile, header)
+    options = read_options(profile, header)
+    if profile.get("engine") == "pyarrow":
+        options["engine"] = "pyarrow"
+    try:
+        return apply_profile(_read(file_path, open_source, **options, **kwargs), profile), missing
+    except (ValueError, TypeError) as e:
+        source = source_key(file_path)
+        logger.warning(f"{os.path.basename(file_path)} does not match the {source} profile ({e}), parsing untyped and relearning")
+        df = _read(file_path, open_source, **kwargs)
+        save_profile(source, learn_profile(df.head(SAMPLE_ROWS)))
+        return df, missing
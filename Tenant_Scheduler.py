@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from Folder_Watcher import FolderWatcher
+from Pipeline_Metrics import registry
+
+logger = logging.getLogger(__name__)
+
+registry.describe("scheduler_files_queued_total", "Drop files queued per tenant")
+registry.describe("scheduler_backpressure_total", "Drop files not queued because the tenant queue was full")
+registry.describe("scheduler_queue_wait_seconds", "Time from detection to the start of the tenant's pipeline run")
+
+
+# Tenant is one bank: its drop folder, who gets the notifications and where the splits go
+class Tenant:
+    def __init__(self, name, folder, recipients=None, updated_root="Updated", revised_root="Revised"):
+        self.name = name
+        self.folder = folder
+        self.recipients = recipients or []
+        self.updated_root = updated_root
+        self.revised_root = revised_root
+
+    def __repr__(self):
+        return f"Tenant({self.name!r}, {self.folder!r})"
+
+
+def load_tenants(config_path):
+    """Read tenants from a JSON list, e.g.
+
+    [{"name": "bank_a", "folder": "./drops/bank_a", "recipients": ["ops@bank-a.com"],
+      "updated_root": "./out/bank_a/Updated", "revised_root": "./out/bank_a/Revised"}]
+    """
+    with open(config_path) as f:
+        entries = json.load(f)
+    tenants = [Tenant(**entry) for entry in entries]
+    names = [t.name for t in tenants]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate tenant names in {config_path}")
+    return tenants
+
+
+# TenantScheduler serves every tenant's drop folder from one process
+class TenantScheduler:
+    """One watcher, per-tenant queues and a shared bounded pool of pipeline runs.
+
+    All folders are watched by a single FolderWatcher. Ready files go to their
+    tenant's queue and a dispatcher hands queues to `max_workers` worker
+    threads round-robin, at most one run per tenant at a time, so a bank that
+    drops hundreds of files cannot starve the others. Each run takes up to
+    `batch_size` files of one tenant. When a tenant's queue already holds
+    `max_queued` files, further files are not queued (back-pressure); the
+    tenant's next run scans its whole folder instead, and the FileLedger picks
+    up everything that was skipped.
+
+    `run_tenant(tenant, trigger_files, detected_at)` runs the pipeline;
+    trigger_files is None for a full folder scan.
+    """
+
+    def __init__(self, tenants, run_tenant, max_workers=4, max_queued=256, batch_size=32, use_polling=False):
+        self.tenants = {t.name: t for t in tenants}
+        self.run_tenant = run_tenant
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.batch_size = batch_size
+        self._queues = {name: deque() for name in self.tenants}  # (path, detected_at)
+        self._rescan = set(self.tenants)  # first run of every tenant picks up files left from before
+        self._busy = set()
+        self._order = deque(self.tenants)
+        self._by_folder = {os.path.abspath(t.folder): t.name for t in tenants}
+        if len(self._by_folder) != len(self.tenants):
+            raise ValueError("Every tenant needs its own drop folder")
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+        self._workers = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tenant-run")
+        self.watcher = FolderWatcher([t.folder for t in tenants], use_polling=use_polling)
+
+    def submit(self, path, detected_at=None):
+        name = self._by_folder.get(os.path.dirname(os.path.abspath(path)))
+        if name is None:
+            logger.warning(f"TenantScheduler got a file outside every tenant folder: {path}")
+            return False
+        with self._cond:
+            queue = self._queues[name]
+            if len(queue) >= self.max_queued:
+                self._rescan.add(name)
+                registry.inc("scheduler_backpressure_total", tenant=name)
+                return False
+            queue.append((path, detected_at if detected_at is not None else time.monotonic()))
+            registry.inc("scheduler_files_queued_total", tenant=name)
+            self._cond.notify()
+        return True
+
+    def queue_depths(self):
+        with self._cond:
+            return {name: len(queue) for name, queue in self._queues.items()}
+
+    def _next_job(self):
+        """Next (tenant, trigger_files, detected_at) in round-robin order, None when nothing is runnable."""
+        for _ in range(len(self._order)):
+            name = self._order[0]
+            self._order.rotate(-1)
+            if name in self._busy:
+                continue
+            queue = self._queues[name]
+            if name in self._rescan:
+                self._rescan.discard(name)
+                detected_at = min((t for _, t in queue), default=None)
+                queue.clear()  # the scan covers whatever was queued
+                return name, None, detected_at
+            if queue:
+                batch = [queue.popleft() for _ in range(min(self.batch_size, len(queue)))]
+                return name, [path for path, _ in batch], min(t for _, t in batch)
+        return None
+
+    def _dispatch(self):
+        while not self._stopped.is_set():
+            with self._cond:
+                job = None
+                while not self._stopped.is_set():
+                    if len(self._busy) < self.max_workers:
+                        job = self._next_job()
+                        if job is not None:
+                            break
+                    self._cond.wait()
+                if job is None:
+                    return
+                self._busy.add(job[0])
+            self._workers.submit(self._run, *job)
+
+    def _run(self, name, trigger_files, detected_at):
+        try:
+            if detected_at is not None:
+                registry.observe("scheduler_queue_wait_seconds", time.monotonic() - detected_at, tenant=name)
+            self.run_tenant(self.tenants[name], trigger_files, detected_at)
+        except Exception as e:
+            logger.error(f"TenantScheduler run for {name} failed: {e}")
+        finally:
+            with self._cond:
+                self._busy.discard(name)
+                self._cond.notify()
+
+    def run_forever(self):
+        self.watcher.start()
+        dispatcher = threading.Thread(target=self._dispatch, name="tenant-dispatch", daemon=True)
+        dispatcher.start()
+        logger.info(f"TenantScheduler serving {len(self.tenants)} tenant(s) with {self.max_workers} worker(s)")
+        try:
+            while not self._stopped.is_set():
+                for path, detected_at in self.watcher.wait_for_files(timeout=1.0):
+                    self.submit(path, detected_at)
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stopped.set()
+        with self._cond:
+            self._cond.notify_all()
+        self.watcher.stop()
+        self._workers.shutdown(wait=True)
@@ -1,17 +1,25 @@
+import io
 import os
+import shutil
+import zipfile
 import pandas as pd
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
-from langchain_openai import ChatOpenAI
-from langchain_core.runnables import Runnable
-from langgraph.graph import StateGraph
 from dotenv import load_dotenv
-from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from Email_Helper import get_transport, build_message
+from Artifact_Store import get_artifact_store
+from Frame_IO import output_file_name, write_frame, read_frame
+from Excel_Reader import read_sheets, EXCEL_SHEETS
+from File_Sniffer import sniff_csv
+from File_Ledger import file_digest, anchor_digest
+from Result_Cache import ResultCache
+from Compressed_Input import COMPRESSED_EXTENSIONS, PACKED_EXTENSIONS, is_packed, csv_members
+from Column_Profiler import ColumnProfiler, describe_profile
+from Schema_Profile import read_csv_typed, profile_for, read_options, apply_profile, source_key, discard_profile, profile_fingerprint
+from Pipeline_Metrics import run_context, in_run
 
+import asyncio
 import logging
-import smtplib
 
 # --------- Load Environment Variables --------- #
 load_dotenv()
@@ -27,140 +35,571 @@ SENDER_EMAIL_ADDRESS = os.getenv("SENDER_EMAIL_ADDRESS")
 logger = logging.getLogger(__name__)
 
 
+def null_row_mask(df):
+    """Single isnull pass over the frame: (per-row "has a null" mask, "every cell is null")."""
+    null_mask = df.isnull().to_numpy()
+    return null_mask.any(axis=1), bool(null_mask.all())
+
+
+def split_frame(df, row_has_null):
+    """Partition the frame with boolean indexing on the row mask, independent of the index labels.
+
+    Returns (training_df, revised_df); only the training split is re-indexed.
+    """
+    return df[~row_has_null].reset_index(drop=True), df[row_has_null]
+
+
+def csv_progress(file_path, offset, rows, clean_rows, data_status):
+    """What an incremental run needs to continue after `offset` bytes, stored in the FileLedger.
+
+    None when the parsed bytes do not end in a newline: the last row may still be
+    being written, so the next change to the file gets a full pass instead of a tail.
+    """
+    if offset == 0:
+        return None
+    with open(file_path, 'rb') as f:
+        f.seek(offset - 1)
+        if f.read(1) != b"\n":
+            return None
+    return {"offset": offset, "rows": rows, "clean_rows": clean_rows, "data_status": data_status,
+            "anchor_hash": anchor_digest(file_path, offset)}
+
+
+class _PrefixReader(io.RawIOBase):
+    # the first `limit` bytes of a file, so rows appended while pandas reads are left for the next run
+    def __init__(self, file_path, limit):
+        self._file = open(file_path, 'rb')
+        self._left = limit
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self._file.readinto(memoryview(buffer)[:min(len(buffer), self._left)]) if self._left else 0
+        self._left -= n
+        return n
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def open_prefix(file_path, size):
+    return io.BufferedReader(_PrefixReader(file_path, size), 1 << 20)
+
+
+def _discard_partial(part_path):
+    os.remove(part_path)
+    try:
+        os.rmdir(os.path.dirname(part_path)) # only succeeds when nothing else lives there
+    except OSError:
+        pass
+
+
+def validate_and_split_streaming(file_path, chunksize, updated_root="Updated", revised_root="Revised", profile=None, open_source=None, stem=None):
+    """Chunked variant of `validate_and_split` for CSVs too big to load at once.
+
+    The null mask is computed once per chunk and clean/incomplete rows are appended
+    to <updated_root>/<name>/ and <revised_root>/<name>/ as they are read, so peak memory is bounded
+    by `chunksize` rows. The data_status 0/1/2 decision is the same as the in-memory
+    path; `profile` (see Schema_Profile) fixes the dtypes so every chunk formats
+    alike, without one only float formatting may differ between chunks.
+    `open_source` and `stem` stream one member of a packed drop (Compressed_Input)
+    into <root>/<stem>/<stem>.csv instead.
+    """
+    file_name = os.path.basename(file_path)
+    size = os.path.getsize(file_path) # only these bytes are parsed, see csv_progress
+    if open_source is None:
+        open_source = lambda: open_prefix(file_path, size)
+    out_name = file_name if stem is None else f"{stem}.csv"
+    stem = stem or file_name.split('.')[0]
+    with open_source() as source:
+        columns = pd.read_csv(source, nrows=0).columns
+    updated_file_path = WatchdogAgent.dynamic_create_subfolder(updated_root,stem,out_name)
+    revised_file_path = WatchdogAgent.dynamic_create_subfolder(revised_root,stem,out_name)
+    total_rows = clean_rows = 0
+    any_null, all_null = False, True
+    profiler = ColumnProfiler() # accumulates over the chunks
+    with open_source() as source, \
+            open(updated_file_path + ".part", 'w', newline='') as updated_out, open(revised_file_path + ".part", 'w', newline='') as revised_out:
+        reader = pd.read_csv(source, chunksize=chunksize, **read_options(profile, columns))
+        for i, chunk in enumerate(reader):
+            chunk = apply_profile(chunk, profile)
+            row_has_null, chunk_all_null = profiler.update(chunk)
+            all_null = all_null and chunk_all_null
+            any_null = any_null or bool(row_has_null.any())
+            training_chunk, revised_chunk = split_frame(chunk, row_has_null)
+            training_chunk.to_csv(updated_out, index=False, header=(i == 0))
+            revised_chunk.to_csv(revised_out, index=False, header=(i == 0))
+            total_rows += len(chunk)
+            clean_rows += int((~row_has_null).sum())
+
+    if total_rows == 0 or all_null: # Columns Present but no data
+        _discard_partial(updated_file_path + ".part")
+        _discard_partial(revised_file_path + ".part")
+        report = {"file": file_name, "records": total_rows, "data_status":0, "source_path": file_path}
+        logging.info(f"WatchdogAgent has not picked latest file: {file_name}")
+    elif any_null: # Data but few , Null value exist in the file
+        os.replace(updated_file_path + ".part", updated_file_path)
+        os.replace(revised_file_path + ".part", revised_file_path)
+        report = {"file":file_name,"records":clean_rows,"data_status":1,"file_path":updated_file_path,"revised_file_path":revised_file_path,"source_path":file_path}
+    else: # the source file is already clean, keep pointing at it like the in-memory path
+        _discard_partial(updated_file_path + ".part")
+        _discard_partial(revised_file_path + ".part")
+        report = {"file": file_name, "records": total_rows,"data_status":2,"file_path":file_path,"revised_file_path":None,"source_path":file_path}
+    report["profile"] = profiler.result()
+    report["progress"] = csv_progress(file_path, size, total_rows, clean_rows if report["data_status"] != 0 else 0, report["data_status"])
+    return report
+
+
+def split_and_report(df, file_path, stem, spill=False, output_format="csv", sheet=None, updated_root="Updated", revised_root="Revised", member=None):
+    """Classify one parsed frame (a CSV, one workbook sheet or one archive member) and write its splits under <updated_root>/<stem>/ and <revised_root>/<stem>/."""
+    file_name = os.path.basename(file_path)
+    # sheets and packed CSVs are written as plain CSV named after the stem, not into a file still called .xlsx/.gz
+    out_name = file_name if sheet is None and file_name.endswith('.csv') else f"{stem}.csv"
+    profiler = ColumnProfiler() # its isnull pass is the one the split uses
+    row_has_null, all_null = profiler.update(df)
+    if df.empty or all_null: # Columns Present but no data
+        report = {"file": file_name, "records": len(df), "data_status":0, "source_path": file_path}
+        logging.info(f"WatchdogAgent has not picked latest file: {file_name}")
+
+    elif row_has_null.any():  # Data but few , Null value exist in the dataframe
+        # training_df moves into preprocessing, revised_df goes back to the bank to revisit the records
+        training_df, revised_df = split_frame(df, row_has_null)
+        logger.info(stem)
+        updated_file_path = WatchdogAgent.dynamic_create_subfolder(updated_root,stem,output_file_name(out_name, output_format))
+        revised_file_path = WatchdogAgent.dynamic_create_subfolder(revised_root,stem,out_name)
+        write_frame(training_df, updated_file_path, output_format)
+        revised_df.to_csv(revised_file_path,index=False)
+        report = {"file":file_name,"records":len(training_df),"data_status":1,"file_path":f"{updated_file_path}","revised_file_path":f'{revised_file_path}',"source_path":file_path}
+        report["artifact"] = get_artifact_store().put(training_df, stem, spill=spill)
+
+    else:
+        training_path = file_path
+        if output_format != "csv" or sheet is not None or member is not None: # give the modelling stage a fast-loading copy, and each sheet/member its own file
+            training_path = WatchdogAgent.dynamic_create_subfolder(updated_root,stem,output_file_name(out_name, output_format))
+            write_frame(df, training_path, output_format)
+        report = {"file": file_name, "records": len(df),"data_status":2,"file_path":training_path,"revised_file_path":None,"source_path":file_path}
+        report["artifact"] = get_artifact_store().put(df, stem, spill=spill)
+    report["profile"] = profiler.result()
+    if sheet is not None:
+        report["sheet"] = sheet
+    if member is not None:
+        report["member"] = member
+    return report
+
+
+def stream_with_profile(file_path, chunksize, updated_root="Updated", revised_root="Revised", profile_path=None, open_source=None, stem=None):
+    """`validate_and_split_streaming` with the source's schema profile, untyped when a chunk does not fit it."""
+    profile_path = profile_path or file_path
+    profile = profile_for(profile_path, open_source)
+    try:
+        return validate_and_split_streaming(file_path, chunksize, updated_root, revised_root, profile, open_source, stem)
+    except pd.errors.EmptyDataError: # no header at all, not a profile mismatch
+        raise
+    except (ValueError, TypeError) as e: # a later chunk does not fit the learned dtypes
+        logger.warning(f"{os.path.basename(profile_path)} does not match its schema profile ({e}), streaming it untyped")
+        discard_profile(source_key(profile_path))
+        return validate_and_split_streaming(file_path, chunksize, updated_root, revised_root, None, open_source, stem)
+
+
+def validate_and_split_packed(file_path, chunksize=None, spill=False, output_format="csv", updated_root="Updated", revised_root="Revised"):
+    """`validate_and_split` for .csv.gz, .csv.zst and .zip drops, one report per CSV member.
+
+    Every member is decompressed in a stream straight into the same typed,
+    streaming or in-memory path as a plain CSV; no unpacked copy is written.
+    A clean .csv.gz/.csv.zst keeps pointing at the drop file (pandas reads it
+    back by suffix), a clean zip member gets its own copy under Updated/.
+    Incremental appends do not apply to packed files.
+    """
+    file_name = os.path.basename(file_path)
+    reports = []
+    with csv_members(file_path) as members:
+        for member, stem, profile_path, open_member in members:
+            try:
+                if chunksize:
+                    report = stream_with_profile(file_path, chunksize, updated_root, revised_root, profile_path, open_member, stem)
+                    report.pop("progress")
+                    if member is not None and report["data_status"] == 2: # the archive itself is no CSV the modelling stage can read
+                        report["file_path"] = WatchdogAgent.dynamic_create_subfolder(updated_root, stem, f"{stem}.csv")
+                        with open_member() as source, open(report["file_path"], 'wb') as out:
+                            shutil.copyfileobj(source, out)
+                else:
+                    df, missing = read_csv_typed(profile_path, open_member)
+                    report = split_and_report(df, file_path, stem, spill, output_format, None, updated_root, revised_root, member)
+                    if missing:
+                        report["missing_columns"] = missing
+            except pd.errors.EmptyDataError: # zero-byte member
+                logging.info(f"WatchdogAgent has not picked latest file: {file_name} {member or ''} (no data)")
+                report = {"file": file_name, "records": 0, "data_status": 0, "source_path": file_path}
+            if member is not None:
+                report["member"] = member
+            reports.append(report)
+    if not reports:
+        logging.info(f"WatchdogAgent found no CSV in {file_name}")
+        reports.append({"file": file_name, "records": 0, "data_status": 0, "source_path": file_path})
+    return reports
+
+
+def validate_and_split(file_path, chunksize=None, spill=False, output_format="csv", updated_root="Updated", revised_root="Revised"):
+    """Check one drop file and split it into Updated/ (training) and Revised/ (back to bank).
+
+    Returns a list of reports: one for a CSV, one per selected sheet for a workbook,
+    one per CSV member for a .csv.gz/.csv.zst/.zip (`validate_and_split_packed`).
+    CSVs are sniffed first (File_Sniffer) so trivially empty ones skip pandas.
+    Module level so it can run inside the WatchdogAgent process pool. CSVs are
+    streamed in `chunksize` rows when it is set; workbooks go through Excel_Reader's
+    read-only path. The parsed training frame is also put in the ArtifactStore
+    (spilled to Arrow when running in a worker process) and its handle is reported
+    as "artifact". The Updated/ split is written in `output_format` (csv, parquet
+    or feather); Revised/ always stays CSV for the bank. Each tenant can point
+    `updated_root` and `revised_root` somewhere else.
+    """
+    file_name = os.path.basename(file_path)
+    stem = file_name.split('.')[0]
+    if file_name.endswith('.xlsx'):
+        sheets = list(read_sheets(file_path))
+        if len(sheets) == 1: # single-sheet workbooks keep the plain folder name
+            return [split_and_report(sheets[0][1], file_path, stem, spill, output_format, sheets[0][0], updated_root, revised_root)]
+        return [split_and_report(df, file_path, f"{stem}_{name}", spill, output_format, name, updated_root, revised_root) for name, df in sheets]
+    if is_packed(file_name):
+        return validate_and_split_packed(file_path, chunksize, spill, output_format, updated_root, revised_root)
+    sniff = sniff_csv(file_path, count_rows=False) # zero-byte, header-only and all-delimiter files never reach pandas
+    if sniff["empty"]:
+        logging.info(f"WatchdogAgent has not picked latest file: {file_name} ({sniff['size']} bytes, {sniff['rows']} data rows)")
+        return [{"file": file_name, "records": sniff["rows"], "data_status":0, "source_path": file_path,
+                 "progress": csv_progress(file_path, sniff["size"], sniff["rows"], 0, 0)}]
+    if chunksize: # streamed splits are always written as CSV
+        return [stream_with_profile(file_path, chunksize, updated_root, revised_root)]
+    size = os.path.getsize(file_path) # where an incremental run continues from, rows appended after this are not parsed
+    df, missing = read_csv_typed(file_path, lambda: open_prefix(file_path, size)) # declared dtypes from the source's schema profile
+    report = split_and_report(df, file_path, stem, spill, output_format, None, updated_root, revised_root)
+    if missing:
+        report["missing_columns"] = missing
+    report["progress"] = csv_progress(file_path, size, len(df), report["records"] if report["data_status"] != 0 else 0, report["data_status"])
+    return [report]
+
+
+def validate_and_split_tail(file_path, progress, updated_root="Updated", revised_root="Revised"):
+    """Incremental variant of `validate_and_split` for a CSV that was only appended to.
+
+    Parses just the bytes after `progress["offset"]`, splits those rows and appends
+    them to the existing Updated/ and Revised/ CSVs. Returns None when the file
+    cannot be continued and needs a full pass: it shrank, its processed prefix
+    changed (anchor digest), or the new rows would change a clean file into one
+    with nulls. A trailing row without its newline is left for the next run.
+    """
+    offset = progress["offset"]
+    size = os.path.getsize(file_path)
+    if size <= offset or anchor_digest(file_path, offset) != progress["anchor_hash"]:
+        return None
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        tail = f.read(size - offset)
+    end = tail.rfind(b"\n") + 1
+    if end == 0:
+        return None
+    file_name = os.path.basename(file_path)
+    stem = file_name.split('.')[0]
+    columns = pd.read_csv(file_path, nrows=0).columns
+    # same dtypes as the full pass, a tail that does not fit raises and gets a full reprocess
+    profile = profile_for(file_path)
+    df = apply_profile(pd.read_csv(io.BytesIO(tail[:end]), header=None, names=columns, **read_options(profile, columns)), profile)
+    if progress["rows"] == 0: # header-only until now, the tail is the whole data
+        report = split_and_report(df, file_path, stem, False, "csv", None, updated_root, revised_root)
+    else:
+        row_has_null, _ = null_row_mask(df)
+        updated_file_path = os.path.join(updated_root, stem, file_name)
+        revised_file_path = os.path.join(revised_root, stem, file_name)
+        if progress["data_status"] == 1 and os.path.exists(updated_file_path) and os.path.exists(revised_file_path):
+            training_df, revised_df = split_frame(df, row_has_null)
+            training_df.to_csv(updated_file_path, mode='a', header=False, index=False)
+            revised_df.to_csv(revised_file_path, mode='a', header=False, index=False)
+            report = {"file": file_name, "records": progress["clean_rows"] + len(training_df), "data_status": 1,
+                      "file_path": updated_file_path, "revised_file_path": revised_file_path, "source_path": file_path}
+        elif progress["data_status"] == 2 and not row_has_null.any(): # still clean, keep pointing at the source
+            report = {"file": file_name, "records": progress["rows"] + len(df), "data_status": 2,
+                      "file_path": file_path, "revised_file_path": None, "source_path": file_path}
+        else:
+            return None
+    rows = progress["rows"] + len(df)
+    report["progress"] = csv_progress(file_path, offset + end, rows, report["records"] if report["data_status"] != 0 else 0, report["data_status"])
+    report["appended_rows"] = len(df)
+    logger.info(f"{file_name}: appended {len(df)} new row(s) from byte {offset}")
+    return [report]
+
+
 # WatchdogAgent monitors folder or S3
 class WatchdogAgent: # Data Agent
-    def __init__(self, folder_path):
+    def __init__(self, folder_path, ledger=None, batch=False, max_workers=None, chunksize=None, output_format="csv", result_cache=None,
+                 updated_root="Updated", revised_root="Revised", pool=None, incremental=False, defer_ledger=False):
         self.folder_path = folder_path
+        self.updated_root = updated_root # where the training split goes
+        self.revised_root = revised_root # where the rows sent back to the bank go
+        self.chunksize = chunksize # stream CSVs in chunks of this many rows
+        self.output_format = output_format # csv, parquet or feather for the Updated/ split
+        self.ledger = ledger # FileLedger, skips files that were already processed
+        self.defer_ledger = defer_ledger # checkpointed runs: the files are marked once the whole thread completed
+        self.batch = batch # process every pending file instead of only the newest
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.incremental = incremental # parse only the appended tail of CSVs that grew since the last run
+        self.result_cache = result_cache # ResultCache, re-sent content reuses its earlier reports and splits
+        self.cache_variant = f"{output_format}.{chunksize or 0}.{','.join(EXCEL_SHEETS)}" # settings that change the outputs
+        self._pool = pool # a ProcessPoolExecutor shared between tenants, else created on first batch
 
-    def dynamic_create_subfolder(self, parent_folder,subfolder,file_name):
+    @staticmethod
+    def dynamic_create_subfolder(parent_folder,subfolder,file_name):
         # Build the full subfolder path
         subfolder_path = os.path.join(parent_folder, subfolder)
         # Ensure the subfolder exists (creates parent + subfolder if missing)
         if not os.path.exists(subfolder_path):
             os.makedirs(subfolder_path, exist_ok=True)
         else:
-            logger.info('f Subfolder :{subfolder} already exist.')
+            logger.info(f'Subfolder :{subfolder} already exist.')
         # Build the full file path
         file_path = os.path.join(subfolder_path, file_name)
         return file_path
 
+    def _variant(self, path):
+        # outputs also depend on the schema profiles the CSVs were parsed with, e.g. 1 against 1.0
+        if path.endswith('.xlsx'):
+            return self.cache_variant
+        try:
+            with csv_members(path) if is_packed(path) else nullcontext([(None, None, path, None)]) as members:
+                profile_paths = [profile_path for _, _, profile_path, _ in members]
+        except (OSError, zipfile.BadZipFile): # a broken archive, validate_and_split reports it
+            profile_paths = [path]
+        return f"{self.cache_variant}.{profile_fingerprint(profile_paths)}"
+
+    def process_batch(self, file_paths):
+        """Validate and split the files concurrently, one report per CSV or workbook sheet.
+
+        CSVs that were only appended to are continued from their ledger offset in
+        incremental mode, and files whose content is already in the ResultCache are
+        answered from it. A file that fails is logged and left out of the ledger so
+        the next run retries it.
+        """
+        reports, content_hashes, stats = [], {}, {}
+        for path in list(file_paths):
+            try:
+                st = os.stat(path)
+            except OSError as e: # removed between the scan and now
+                logging.error(f"WatchdogAgent error on {path}: {e}")
+                continue
+            stats[path] = (st.st_size, st.st_mtime_ns) # the version processed, see FileLedger.mark_processed
+        file_paths = list(stats)
+        if self.incremental and self.ledger is not None and self.output_format == "csv":
+            pending = []
+            for path in file_paths:
+                progress = self.ledger.progress(path) if path.endswith('.csv') else None
+                try:
+                    tail_reports = validate_and_split_tail(path, progress, self.updated_root, self.revised_root) if progress else None
+                except Exception as e:
+                    logging.error(f"WatchdogAgent incremental error on {path}, reprocessing in full: {e}")
+                    tail_reports = None
+                if tail_reports is None:
+                    pending.append(path)
+                else:
+                    reports.extend(tail_reports)
+            file_paths = pending
+        if self.result_cache is not None:
+            pending = []
+            for path in file_paths:
+                try:
+                    content_hash = file_digest(path)
+                except OSError as e: # removed between the scan and now
+                    logging.error(f"WatchdogAgent error on {path}: {e}")
+                    continue
+                cached = self.result_cache.get(ResultCache.key(content_hash, self._variant(path)), path,
+                                               roots={"file_path": self.updated_root, "revised_file_path": self.revised_root})
+                if cached is not None:
+                    logger.info(f"ResultCache hit for {path}, reusing {len(cached)} report(s)")
+                    reports.extend(dict(report, content_hash=content_hash) for report in cached)
+                else:
+                    content_hashes[path] = content_hash
+                    pending.append(path)
+            file_paths = pending
+            logger.info(f"ResultCache stats: {self.result_cache.stats()}")
+        if len(file_paths) <= 1 or self.max_workers == 1:
+            jobs = [(path, None) for path in file_paths]
+        else:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            context = run_context() # workers do not see this thread's run, their log records get it passed along
+            jobs = [(path, self._pool.submit(in_run, context, validate_and_split, path, self.chunksize, True, self.output_format,
+                                             self.updated_root, self.revised_root))
+                    for path in file_paths]
+        for path, future in jobs:
+            try:
+                file_reports = future.result() if future is not None else validate_and_split(path, self.chunksize, False, self.output_format, self.updated_root, self.revised_root)
+            except Exception as e:
+                logging.error(f"WatchdogAgent error on {path}: {e}")
+                continue
+            if path in content_hashes:
+                self.result_cache.put(ResultCache.key(content_hashes[path], self._variant(path)), path, file_reports) # profile as learned by this run
+                file_reports = [dict(report, content_hash=content_hashes[path]) for report in file_reports]
+            reports.extend(file_reports)
+        for report in reports:
+            report["source_stat"] = stats[report["source_path"]]
+        return reports
+
     def __call__(self, state):
+        # returns only what it owns; reports are appended to the graph state by its reducer
         try:
-            files = [f for f in os.listdir(self.folder_path) if f.endswith(('.csv', '.xlsx'))]
+            trigger_files = state.get("trigger_files")
+            if trigger_files: # woken by FolderWatcher, no need to rescan the folder
+                files = [os.path.basename(f) for f in trigger_files if os.path.isfile(f)]
+            else:
+                files = [f for f in os.listdir(self.folder_path) if f.endswith(('.csv', '.xlsx') + PACKED_EXTENSIONS)]
+            if self.ledger is not None:
+                files = [f for f in files if not self.ledger.is_processed(os.path.join(self.folder_path, f))]
+                logger.info(f"FileLedger stats: {self.ledger.stats()}")
             if not files:
-                logging.info("WatchdogAgent found no CSV/XLSX files")
-                state["watchdog_state"] = "no files found"
-                state["reports"] = []
-                state["next"] = "watchdog" # only csv and excel
-                return state
-
-            latest_file = max(files, key=lambda f: os.path.getmtime(os.path.join(self.folder_path, f)))
-            file_path = os.path.join(self.folder_path, latest_file)
-            df = pd.read_csv(file_path) if latest_file.endswith('.csv') else pd.read_excel(file_path)
-            if  df.empty == True or df.isnull().all().all() == True: # Columns Present but no data
-                state["next"] = "watchdog"
-                report = {"file": latest_file, "records": len(df), "data_status":0} 
-                logging.info(f"WatchdogAgent has not picked latest file: {latest_file}")
-                state["watchdog_state"] = "unchecked"
-
-            elif df.isnull().any().any() == True:  # Data but few , Null value exist in the dataframe
-                bool_row = pd.isnull(df).any(axis=1).to_list()
-                drop_index = []
-                for i in range(len(bool_row)):
-                    if bool_row[i] == True:
-                        drop_index.append(i)
-                revised_df = pd.DataFrame(df,index=drop_index,columns=df.columns) # need to send back to bank to revisit the record
-                training_df = df.drop(index=drop_index).reset_index(drop=True) # to move into preprocessing 
-                logger.info(latest_file.split('.')[0])
-                updated_file_path = self.dynamic_create_subfolder("Updated",latest_file.split('.')[0],latest_file)
-                revised_file_path = self.dynamic_create_subfolder("Revised",latest_file.split('.')[0],latest_file)
-                training_df.to_csv(updated_file_path,index=False)
-                revised_df.to_csv(revised_file_path,index=False)
-                state["next"] = ["classifier","preprocessing"]
-                state["watchdog_state"] = "checked"
-                report = {"file":latest_file,"records":len(training_df),"data_status":1,"file_path":f"{updated_file_path}","revised_file_path":f'{revised_file_path}'}
-                
+                logging.info("WatchdogAgent found no new CSV/XLSX files")
+                return {"watchdog_state": "no files found", "next": "watchdog"} # only csv and excel
+
+            if not self.batch:
+                files = [files[0] if len(files) == 1 else max(files, key=lambda f: os.path.getmtime(os.path.join(self.folder_path, f)))]
+            reports = self.process_batch([os.path.join(self.folder_path, f) for f in files])
+            logging.info(f"WatchdogAgent produced {len(reports)} report(s) from {len(files)} file(s)")
+
+            if any(report["data_status"] != 0 for report in reports):
+                update = {"next": ["classifier","preprocessing"], "watchdog_state": "checked"}
+            elif reports:
+                update = {"next": ["classifier"], "watchdog_state": "unchecked"} # notify the bank, nothing to preprocess
             else:
-                state["next"] = ["classifier","preprocessing"]
-                report = {"file": latest_file, "records": len(df),"data_status":2,"file_path":file_path,"revised_file_path":None}
-                state["watchdog_state"] = "checked"
-            state["reports"] = report
-            return state
+                update = {"next": "watchdog", "watchdog_state": "error: no file could be processed"}
+            if self.ledger is None: # nothing to record them in, keep them out of the state
+                for report in reports:
+                    report.pop("progress", None)
+                    report.pop("source_stat", None)
+            elif not self.defer_ledger:
+                self.ledger.mark_reports(reports)
+            update["reports"] = reports
+            return update
         except Exception as e:
             logging.error(f"WatchdogAgent error: {e}")
-            state["watchdog_state"] = f"error: {e}"
-            state["reports"] = []
-            return state
+            return {"watchdog_state": f"error: {e}"}
     
     
 
 # ClassifierAgent checks and sends email
 class ClassifierAgent: # Communication Hub
+    def __init__(self, outbox=None, recipients=None, digest=None):
+        self.outbox = outbox # NotificationOutbox, when set emails are queued instead of sent inline
+        self.digest = digest # NotificationDigest, when set results are collected into one email per window
+        self.recipients = recipients or [SENDER_EMAIL_ADDRESS] # the bank contacts of this drop folder
+
     def __call__(self, state):
+        # only the classifier's own keys go back, preprocessing runs in the same step
+        update = {}
         try:
-            logger.info(f"{state.get('reports')}")
-            report = state.get('reports')
+            contents, messages = [], []
+            for report in state.get('reports', []):
+                logger.debug("ClassifierAgent report %s", report)
 
-            if report["data_status"] == 0:
-                content = "the file is empty and can't to used for Modelling"
-
-            elif report["data_status"] == 1:
-                content = "the file meet the minimum required data for Modelling. Please update the above file and resend it for next iteration."
-            
-            elif report["data_status"] == 2:
-                content = "the file contain data is good to go for Modelling."
-            
-            state["content"] = content
-            
-            #logger.info("Sending...")
-            self.send_email(report["revised_file_path"],report["file"], content)
+                if report["data_status"] == 0:
+                    content = "the file is empty and can't to used for Modelling"
+
+                elif report["data_status"] == 1:
+                    content = "the file meet the minimum required data for Modelling. Please update the above file and resend it for next iteration."
+                
+                elif report["data_status"] == 2:
+                    content = "the file contain data is good to go for Modelling."
+                
+                if report.get("missing_columns"):
+                    content += f" Expected column(s) missing: {', '.join(map(str, report['missing_columns']))}."
+                findings = describe_profile(report.get("profile"))
+                if findings:
+                    content += f" {findings}"
+                contents.append(content)
+                part = report.get("sheet") or report.get("member")
+                filename = f"{report['file']} [{part}]" if part else report["file"]
+
+                if self.digest is not None:
+                    for recipient in self.recipients:
+                        self.digest.add(recipient, filename, report["data_status"], report.get("records"), content,
+                                        report.get("revised_file_path"))
+                elif self.outbox is not None:
+                    subject, body = self.email_text(filename, content)
+                    for recipient in self.recipients:
+                        self.outbox.enqueue(recipient, subject, body, report.get("revised_file_path"))
+                else:
+                    messages.append((self.build_email(report.get("revised_file_path"),filename, content), self.recipients))
+            update["content"] = contents
+            if self.digest is not None:
+                logging.info(f"ClassifierAgent added {len(contents)} result(s) to the digest")
+                update["classifier_state"] = "added to digest"
+                return update
+            if self.outbox is not None:
+                logging.info(f"ClassifierAgent queued {len(contents)} notification(s)")
+                update["classifier_state"] = "notifications queued"
+                return update
+
+            if messages: # one pooled SMTP session for every notification of this run
+                get_transport().send_many(messages, from_addr=EMAIL_ADDRESS)
+            for report, content in zip(state.get('reports', []), contents):
+                logger.info(f"Email sent for {report['file']} with status {content}")
             logging.info("ClassifierAgent completed notifications")
-            state["classifier_state"] = "notifications sent"
-            return state
+            update["classifier_state"] = "notifications sent"
+            return update
         except Exception as e:
             logging.error(f"ClassifierAgent error: {e}")
-            state["classifier_state"] = f"error: {e}"
-            return state
+            update["classifier_state"] = f"error: {e}"
+            return update
         
 
-    def send_email(self,attachment, filename, status):
+    def email_text(self, filename, status):
         subject = f"File Check Result: {filename}"
-        body = f"The file {filename} has been processed and is {status}."
-        msg = MIMEText(body)
-        msg['Subject'] = subject
-        msg['From'] = EMAIL_ADDRESS
-        msg['To'] = SENDER_EMAIL_ADDRESS 
-
-        # Only attach files if present
-        if attachment: # since attachment is dataframe
-            msg = MIMEMultipart()
-            msg.attach(MIMEText(body, 'plain'))
-            if os.path.isfile(attachment):
-                with open(attachment, 'rb') as f:
-                    part = MIMEBase('application', 'octet-stream')
-                    part.set_payload(f.read())
-                    encoders.encode_base64(part)
-                    filename = os.path.basename(attachment)
-                    part.add_header('Content-Disposition', f'attachment; filename="{filename}"')
-                    msg.attach(part)
-        else:
-            msg = MIMEText(body, 'plain')
+        body = f"The file {filename} has been processed and is {status.rstrip('.')}." # findings end in their own full stop
+        return subject, body
 
-        
-        with smtplib.SMTP("smtp.gmail.com", 587) as server:
-            server.starttls()
-            server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_ADDRESS, SENDER_EMAIL_ADDRESS, msg.as_string())
+    def build_email(self,attachment, filename, status):
+        subject, body = self.email_text(filename, status)
+        return build_message(", ".join(self.recipients), subject, body, attachment)
+
+    def send_email(self,attachment, filename, status):
+        msg = self.build_email(attachment, filename, status)
+        get_transport().send(msg, self.recipients, from_addr=EMAIL_ADDRESS)
         logger.info(f"Email sent for {filename} with status {status}")
     
 
 
 class PreprocessingAgent:
+    def __init__(self, chunksize=None):
+        self.chunksize = chunksize # count CSV rows chunk by chunk instead of loading the file
+
     def __call__(self, state):
-        file_path = state.get('reports')['file_path']
-        logger.info(f"Preprocessing:{file_path}")
-        train_df = pd.read_csv(file_path) if file_path.endswith('.csv') else pd.read_excel(file_path)
-        logger.info("Preprocessing File contain "+{len(train_df)}+"records")
-        state["preprocessing_state"] = "checked"
-        state["next"] = "training"
-        return state
\ No newline at end of file
+        for report in state.get('reports', []):
+            if report["data_status"] == 0:
+                continue
+            file_path = report['file_path']
+            logger.info(f"Preprocessing:{file_path}")
+            train_df = get_artifact_store().get(report.get("artifact"))
+            if train_df is not None: # already parsed by the WatchdogAgent, no second trip through the CSV parser
+                records = len(train_df)
+                get_artifact_store().release(report["artifact"])
+            elif self.chunksize and file_path.endswith(('.csv',) + COMPRESSED_EXTENSIONS):
+                records = sum(len(chunk) for chunk in pd.read_csv(file_path, chunksize=self.chunksize))
+            else:
+                train_df = read_frame(file_path) # csv, xlsx, parquet or feather by suffix
+                records = len(train_df)
+            logger.info(f"Preprocessing File contain {records} records")
+        return {"preprocessing_state": "checked"} # `next` belongs to the watchdog, the parallel branches only write their own keys
+
+
+# Async variants for app.ainvoke/astream: the blocking pandas, disk and SMTP work
+# runs in worker threads so many file pipelines can share one event loop.
+class AsyncWatchdogAgent(WatchdogAgent):
+    async def __call__(self, state):
+        return await asyncio.to_thread(WatchdogAgent.__call__, self, state)
+
+
+class AsyncClassifierAgent(ClassifierAgent):
+    async def __call__(self, state):
+        return await asyncio.to_thread(ClassifierAgent.__call__, self, state)
+
+
+class AsyncPreprocessingAgent(PreprocessingAgent):
+    async def __call__(self, state):
+        return await asyncio.to_thread(PreprocessingAgent.__call__, self, state)
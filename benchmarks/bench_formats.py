@@ -0,0 +1,59 @@
+"""Write/read time and on-disk size of the Updated/ split as CSV vs Parquet vs Feather.
+
+Usage: python benchmarks/bench_formats.py [rows] [columns]   (default 200000 rows x 60 columns)
+"""
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Frame_IO import write_frame, read_frame
+
+CASES = [
+    ("csv", None),
+    ("parquet", "snappy"),
+    ("parquet", "zstd"),
+    ("feather", "uncompressed"),
+    ("feather", "lz4"),
+]
+
+
+def make_wide_frame(rows, columns, seed=0):
+    # bank-extract shaped: mostly numeric measures, some ids, codes and names
+    rng = np.random.default_rng(seed)
+    data = {}
+    for i in range(columns):
+        kind = i % 5
+        if kind in (0, 1):
+            data[f"amount_{i}"] = rng.normal(1000, 250, size=rows).round(2)
+        elif kind == 2:
+            data[f"id_{i}"] = rng.integers(0, 10_000_000, size=rows)
+        elif kind == 3:
+            data[f"code_{i}"] = rng.choice(["SAV", "CUR", "LOAN", "CARD", "FD"], size=rows)
+        else:
+            data[f"name_{i}"] = rng.choice(["Ram", "Shyam", "Sita", "Divya", "Nikhil"], size=rows)
+    return pd.DataFrame(data)
+
+
+if __name__ == "__main__":
+    rows = int(float(sys.argv[1])) if len(sys.argv) > 1 else 200_000
+    columns = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    df = make_wide_frame(rows, columns)
+    print(f"{rows:,} rows x {columns} columns")
+    print(f"{'format':>22} {'write s':>9} {'read s':>9} {'size MB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for output_format, compression in CASES:
+            path = os.path.join(tmp, f"split_{output_format}_{compression}.{output_format}")
+            start = time.perf_counter()
+            write_frame(df, path, output_format, compression=compression)
+            write_time = time.perf_counter() - start
+            start = time.perf_counter()
+            loaded = read_frame(path)
+            read_time = time.perf_counter() - start
+            assert loaded.shape == df.shape
+            label = output_format if compression is None else f"{output_format} ({compression})"
+            print(f"{label:>22} {write_time:>9.3f} {read_time:>9.3f} {os.path.getsize(path) / 1e6:>9.1f}")
@@ -0,0 +1,183 @@
+"""End-to-end benchmark of the WatchdogAgent -> ClassifierAgent -> PreprocessingAgent graph.
+
+Generates a synthetic drop folder, runs the real compiled graph once per file
+against a local SMTP stub and reports throughput, p50/p99 latency and peak RSS
+per stage. Results are compared with a stored baseline so regressions fail the
+run (exit code 1) before deploy.
+
+Usage:
+    python benchmarks/bench_pipeline.py --files 20 --rows 50000 --cols 20 --null-density 0.01
+    python benchmarks/bench_pipeline.py ... --save-baseline   # record the current numbers
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from smtp_stub import SMTPStub
+
+STAGES = ("watchdog", "classifier", "preprocessing")
+
+
+def generate_drop_folder(folder, files, rows, cols, null_density, file_format, seed=0):
+    rng = np.random.default_rng(seed)
+    paths = []
+    for n in range(files):
+        data = {}
+        for i in range(cols):
+            if i % 4 == 3:
+                data[f"name_{i}"] = rng.choice(["Ram", "Shyam", "Sita", "Divya", "Nikhil"], size=rows).astype(object)
+            else:
+                data[f"value_{i}"] = rng.normal(size=rows).round(4)
+        df = pd.DataFrame(data)
+        if null_density:
+            mask = rng.random(size=df.shape) < null_density
+            df = df.mask(mask)
+        path = os.path.join(folder, f"synthetic_{n:04d}.{file_format}")
+        if file_format == "csv":
+            df.to_csv(path, index=False)
+        else:
+            df.to_excel(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    return float(np.percentile(values, q * 100))
+
+
+def run_benchmark(args):
+    workspace = tempfile.mkdtemp(prefix="bench_pipeline_")
+    cwd = os.getcwd()
+    os.chdir(workspace)  # Updated/ and Revised/ are written relative to the working directory
+    try:
+        return _run_in_workspace(args, workspace)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+def _run_in_workspace(args, workspace):
+    folder = os.path.join(workspace, "watch_folder")
+    os.makedirs(folder)
+    paths = generate_drop_folder(folder, args.files, args.rows, args.cols, args.null_density, args.format)
+
+    smtp = SMTPStub().start()
+    os.environ.update({"SMTP_HOST": "127.0.0.1", "SMTP_PORT": str(smtp.port), "SMTP_STARTTLS": "0",
+                       "EMAIL_ADDRESS": "bench@localhost", "EMAIL_PASSWORD": "",
+                       "SENDER_EMAIL_ADDRESS": "bank@localhost"})
+    # imported after the SMTP settings are in place, Email_Helper reads them at import time
+    from Pipeline_Graph import PipelineState, build_graph
+    from Pipeline_Metrics import track_run
+
+    app = build_graph(folder, batch=False, chunksize=args.chunksize, output_format=args.output_format)
+    runs = []
+    start = time.perf_counter()
+    for path in paths:
+        with track_run(trigger_files=[path]) as run:
+            app.invoke(PipelineState(trigger_files=[path]).to_dict())
+        runs.append(run)
+    elapsed = time.perf_counter() - start
+    smtp.stop()
+
+    results = {
+        "files_per_second": len(paths) / elapsed,
+        "rows_per_second": len(paths) * args.rows / elapsed,
+        "run_p50": percentile([r["wall_seconds"] for r in runs], 0.50),
+        "run_p99": percentile([r["wall_seconds"] for r in runs], 0.99),
+        "smtp_p50": percentile([s for r in runs for s in r["smtp_seconds"]], 0.50),
+        "emails_received": smtp.messages,
+        "stages": {},
+    }
+    for stage in STAGES:
+        walls = [r["nodes"][stage]["wall_seconds"] for r in runs if stage in r["nodes"]]
+        rss = [r["nodes"][stage]["max_rss_kb"] for r in runs if stage in r["nodes"] and r["nodes"][stage]["max_rss_kb"]]
+        growth = [r["nodes"][stage]["rss_growth_kb"] for r in runs if stage in r["nodes"] and r["nodes"][stage].get("rss_growth_kb") is not None]
+        results["stages"][stage] = {
+            "runs": len(walls),
+            "p50": percentile(walls, 0.50),
+            "p99": percentile(walls, 0.99),
+            "peak_rss_mb": max(rss) / 1024 if rss else None,
+            "rss_growth_mb": max(growth) / 1024 if growth else None,  # what the stage itself allocated on top
+        }
+    return results
+
+
+def scenario_key(args):
+    return f"{args.files}f-{args.rows}r-{args.cols}c-{args.null_density}n-{args.format}-{args.output_format}-chunk{args.chunksize or 0}"
+
+
+def print_results(key, results):
+    print(f"scenario {key}")
+    print(f"  throughput      {results['files_per_second']:.2f} files/s, {results['rows_per_second']:,.0f} rows/s")
+    print(f"  run latency     p50 {results['run_p50']:.4f}s  p99 {results['run_p99']:.4f}s")
+    if results["smtp_p50"] is not None:
+        print(f"  smtp send       p50 {results['smtp_p50']:.4f}s ({results['emails_received']} emails)")
+    for stage, numbers in results["stages"].items():
+        if not numbers["runs"]:
+            continue
+        rss = f"{numbers['peak_rss_mb']:.0f} MB" if numbers["peak_rss_mb"] else "n/a"
+        if numbers.get("rss_growth_mb") is not None:
+            rss += f" (+{numbers['rss_growth_mb']:.0f} MB)"
+        print(f"  {stage:<15} p50 {numbers['p50']:.4f}s  p99 {numbers['p99']:.4f}s  peak RSS {rss}")
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Regressions: throughput below or a stage p99 above the baseline by more than `tolerance`."""
+    regressions = []
+    if results["files_per_second"] < baseline["files_per_second"] * (1 - tolerance):
+        regressions.append(f"throughput {results['files_per_second']:.2f} < baseline {baseline['files_per_second']:.2f} files/s")
+    for stage, numbers in results["stages"].items():
+        base = baseline["stages"].get(stage)
+        if base and base["p99"] and numbers["p99"] and numbers["p99"] > base["p99"] * (1 + tolerance):
+            regressions.append(f"{stage} p99 {numbers['p99']:.4f}s > baseline {base['p99']:.4f}s")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--cols", type=int, default=12)
+    parser.add_argument("--null-density", type=float, default=0.01, help="fraction of cells left empty")
+    parser.add_argument("--format", choices=["csv", "xlsx"], default="csv")
+    parser.add_argument("--output-format", choices=["csv", "parquet", "feather"], default="csv")
+    parser.add_argument("--chunksize", type=int, default=None, help="use the streaming validation path")
+    parser.add_argument("--baseline", default=os.path.join(REPO_ROOT, "benchmarks", "baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.20)
+    args = parser.parse_args()
+
+    key = scenario_key(args)
+    results = run_benchmark(args)
+    print_results(key, results)
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    if args.save_baseline:
+        baselines[key] = results
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+    elif key in baselines:
+        regressions = compare_with_baseline(results, baselines[key], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("no regressions against baseline")
+    else:
+        print("no baseline for this scenario, run with --save-baseline to record one")
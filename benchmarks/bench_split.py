@@ -0,0 +1,64 @@
+"""Micro-benchmark of the WatchdogAgent null-row split: the original list/loop/drop code vs split_frame.
+
+Usage: python benchmarks/bench_split.py [rows ...]   (default 1e5 1e6 1e7)
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Updated_Agent import null_row_mask, split_frame
+
+
+def legacy_split(df):
+    # the data_status == 1 branch as it was originally written
+    bool_row = pd.isnull(df).any(axis=1).to_list()
+    drop_index = []
+    for i in range(len(bool_row)):
+        if bool_row[i] == True:
+            drop_index.append(i)
+    revised_df = pd.DataFrame(df, index=drop_index, columns=df.columns)
+    training_df = df.drop(index=drop_index).reset_index(drop=True)
+    return training_df, revised_df
+
+
+def vectorized_split(df):
+    row_has_null, _ = null_row_mask(df)
+    return split_frame(df, row_has_null)
+
+
+def make_frame(rows, null_fraction=0.05, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "A": rng.normal(size=rows),
+        "B": rng.integers(0, 1000, size=rows).astype(float),
+        "C": rng.choice(["Ram", "Shyam", "Sita", "Divya", "Nikhil"], size=rows).astype(object),
+        "D": rng.normal(size=rows),
+    })
+    holes = rng.random(size=rows) < null_fraction
+    df.loc[holes, "C"] = None
+    return df
+
+
+def best_of(fn, df, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+if __name__ == "__main__":
+    sizes = [int(float(arg)) for arg in sys.argv[1:]] or [100_000, 1_000_000, 10_000_000]
+    print(f"{'rows':>12} {'legacy s':>10} {'vectorized s':>13} {'speedup':>8}")
+    for rows in sizes:
+        df = make_frame(rows)
+        repeat = 3 if rows <= 1_000_000 else 1
+        legacy_time, (legacy_train, legacy_revised) = best_of(legacy_split, df, repeat)
+        fast_time, (fast_train, fast_revised) = best_of(vectorized_split, df, repeat)
+        assert legacy_train.equals(fast_train) and legacy_revised.equals(fast_revised)
+        print(f"{rows:>12,} {legacy_time:>10.3f} {fast_time:>13.3f} {legacy_time / fast_time:>7.1f}x")
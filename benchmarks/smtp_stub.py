@@ -0,0 +1,53 @@
+"""Minimal local SMTP sink for benchmarks: accepts every message and throws it away."""
+import socketserver
+import threading
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 bench-smtp ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.strip().split(b" ", 1)[0].upper()
+            if command in (b"EHLO", b"HELO"):
+                self.reply("250 bench-smtp")
+            elif command in (b"MAIL", b"RCPT", b"RSET", b"NOOP"):
+                self.reply("250 OK")
+            elif command == b"DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                for data_line in iter(self.rfile.readline, b""):
+                    if data_line in (b".\r\n", b".\n"):
+                        break
+                self.server.messages += 1
+                self.reply("250 OK queued")
+            elif command == b"QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0):
+        super().__init__((host, port), _SinkHandler)
+        self.messages = 0
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="smtp-stub", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
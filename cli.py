@@ -0,0 +1,108 @@
+"""Command line entry point for the drop-folder pipeline.
+
+    python cli.py run [--mode event|async|interval|tenants]   long-running scheduler
+    python cli.py once [--checkpoint-db checkpoints.db]       resume interrupted runs, process pending files, deliver the outbox and exit
+    python cli.py render-graph [-o graph.mmd|graph.png]       draw the agent graph, offline unless --mermaid-api
+
+Each subcommand only imports what it needs; `--import-times` prints how long
+the imports took.
+"""
+import os
+import sys
+import time
+import argparse
+import importlib
+
+_started = time.perf_counter()
+_import_times = []  # (module, seconds)
+
+
+def timed_import(name):
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    _import_times.append((name, time.perf_counter() - start))
+    return module
+
+
+def print_import_times():
+    for name, seconds in _import_times:
+        print(f"import {name:<20} {seconds * 1000:8.1f} ms", file=sys.stderr)
+    heavy = [name for name in ("pandas", "pyarrow", "langgraph") if name in sys.modules]
+    print(f"elapsed              {(time.perf_counter() - _started) * 1000:8.1f} ms (loaded: {', '.join(heavy) or 'no pandas/langgraph'})", file=sys.stderr)
+
+
+def apply_checkpoint_option(args):
+    if args.checkpoint_db:
+        os.environ["CHECKPOINT_PATH"] = args.checkpoint_db  # read by main_updated at import
+
+
+def cmd_run(args):
+    if args.once:
+        return cmd_once(args)
+    if args.mode:
+        os.environ["SCHEDULER_MODE"] = args.mode  # read by main_updated at import
+    apply_checkpoint_option(args)
+    main = timed_import("main_updated")
+    if args.import_times:
+        print_import_times()
+    main.main(main.SCHEDULER_MODE)
+
+
+def cmd_once(args):
+    apply_checkpoint_option(args)
+    main = timed_import("main_updated")
+    pending = main.run_once()
+    if args.import_times:
+        print_import_times()
+    print(f"{pending} file(s) processed")
+
+
+def cmd_render_graph(args):
+    main = timed_import("main_updated")
+    graph = main.make_app().get_graph()
+    if args.import_times:
+        print_import_times()
+    if args.output.endswith(".mmd"):
+        with open(args.output, "w") as f:
+            f.write(graph.draw_mermaid())
+    elif args.mermaid_api: # renders through mermaid.ink, needs the network
+        from langchain_core.runnables.graph import MermaidDrawMethod
+        with open(args.output, "wb") as f:
+            f.write(graph.draw_mermaid_png(draw_method=MermaidDrawMethod.API))
+    else:
+        try:
+            graph.draw_png(args.output) # Graphviz, offline
+        except ImportError:
+            sys.exit("PNG output needs pygraphviz, write a .mmd file or pass --mermaid-api instead")
+    print(f"graph written to {args.output}")
+    if args.open:
+        opener = {"darwin": "open", "win32": "start"}.get(sys.platform, "xdg-open")
+        os.system(f"{opener} {args.output}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--import-times", action="store_true", help="print module import times to stderr")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="watch the drop folder(s) and run the pipeline until stopped")
+    run.add_argument("--mode", choices=["event", "async", "interval", "tenants"], help="defaults to SCHEDULER_MODE")
+    run.add_argument("--once", action="store_true", help="same as the once subcommand")
+    run.add_argument("--checkpoint-db", help="run every file as a resumable thread checkpointed to this SQLite file")
+    run.set_defaults(func=cmd_run)
+
+    once = commands.add_parser("once", help="process pending files, deliver due notifications and exit")
+    once.add_argument("--checkpoint-db", help="run every file as a resumable thread checkpointed to this SQLite file")
+    once.set_defaults(func=cmd_once)
+
+    render = commands.add_parser("render-graph", help="draw the agent graph")
+    render.add_argument("-o", "--output", default="graph.mmd", help=".mmd for Mermaid source, .png for an image")
+    render.add_argument("--mermaid-api", action="store_true", help="render the PNG with the online Mermaid API")
+    render.add_argument("--open", action="store_true", help="open the rendered file afterwards")
+    render.set_defaults(func=cmd_render_graph)
+    return parser
+
+
+if __name__ == "__main__":
+    arguments = build_parser().parse_args()
+    arguments.func(arguments)
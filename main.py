@@ -2,11 +2,12 @@ import logging
 import time
 import os
 import platform
-import smtplib
 from langgraph.graph import StateGraph, START, END
 from email.mime.text import MIMEText
 from Agents import WatchdogAgent,ReceiverAgent,ClassifierAgent
+from Folder_Watcher import FolderWatcher
 from dotenv import load_dotenv
+from Email_Helper import get_transport
 
 class PipelineState:
     def __init__(self, reports=None, watchdog_state=None, receiver_state=None, classifier_state=None):
@@ -31,6 +32,8 @@ EMAIL_ADDRESS = os.getenv("EMAIL_ADDRESS")  # your Gmail or SMTP email
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")  # your app-specific password or SMTP password
 SENDER_EMAIL_ADDRESS = os.getenv("SENDER_EMAIL_ADDRESS")
 ADMIN_EMAIL = os.getenv('ADMIN_EMAIL')
+WATCH_FOLDER = "./watch_folder"
+WATCH_POLLING = os.getenv("WATCH_POLLING", "0") == "1"  # force the polling observer, e.g. on network shares
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
@@ -45,16 +48,13 @@ def send_failure_email(error_message):
     msg['From'] = EMAIL_ADDRESS
     msg['To'] = ADMIN_EMAIL  # The administrator or responsible party
 
-    with smtplib.SMTP("smtp.gmail.com", 587) as server:
-        server.starttls()
-        server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-        server.sendmail(EMAIL_ADDRESS, [ADMIN_EMAIL], msg.as_string())
-        logger.info(f"Failure email sent to {ADMIN_EMAIL}")
+    get_transport().send(msg, [ADMIN_EMAIL], from_addr=EMAIL_ADDRESS)
+    logger.info(f"Failure email sent to {ADMIN_EMAIL}")
 
 
 # Build the graph using a basic dictionary schema
 graph = StateGraph(state_schema=dict)
-graph.add_node("watchdog", WatchdogAgent(folder_path="./watch_folder"))
+graph.add_node("watchdog", WatchdogAgent(folder_path=WATCH_FOLDER))
 graph.add_node("receiver", ReceiverAgent())
 graph.add_node("classifier", ClassifierAgent())
 
@@ -73,21 +73,25 @@ else:                                   # Linux
     os.system("xdg-open graph.png")
 
 
-# Run the graph periodically (every 2 minutes)
+# Run the graph whenever a file lands in the watch folder
 if __name__ == "__main__":
-    logger.info("Starting Watchdog Agent Pipeline with scheduler...")
+    logger.info("Starting Watchdog Agent Pipeline with folder watcher...")
+    watcher = FolderWatcher(WATCH_FOLDER, use_polling=WATCH_POLLING).start()
+    ready = []
     while True:
         try:
             logger.info("Triggering pipeline run...")
+            if ready:
+                detected_at = min(t for _, t in ready)
+                logger.info(f"Detect-to-invoke latency: {(time.monotonic() - detected_at) * 1000:.1f} ms")
             initial_state = PipelineState().to_dict()
             result = app.invoke(initial_state)
             logging.info(f"Pipeline result: {result}")
-            logger.info("Pipeline run completed. Waiting 2 minutes before next check...")
-            time.sleep(60)  # 120 seconds = 1 minutes
+            logger.info("Pipeline run completed. Waiting for the next file...")
         except Exception as e:
             logger.error(f"Pipeline encountered an error: {e}")
             send_failure_email(f"Pipeline encountered an error: {e}")
-            time.sleep(60)  # Wait before retrying
+        ready = watcher.wait_for_files()
 
 
 
@@ -1,39 +1,20 @@
+import asyncio
 import logging
 import time
-import platform
 import os
-import smtplib
-from langgraph.graph import StateGraph, END, START
-from email.mime.text import MIMEText
-from Updated_Agent import WatchdogAgent,ClassifierAgent,PreprocessingAgent
+import threading
+from Folder_Watcher import FolderWatcher, WATCHED_EXTENSIONS
+from File_Ledger import FileLedger
+from Result_Cache import ResultCache
+from Notification_Outbox import NotificationOutbox, OutboxWorker, NotificationDigest
+from Pipeline_Metrics import track_run, RunRecorder, start_metrics_server
+from Pipeline_Logging import setup_logging
+from Tenant_Scheduler import TenantScheduler, load_tenants
+from Run_Checkpoints import open_checkpointer, has_open_threads, open_threads, run_thread, thread_id_for, tenant_of
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
-from typing import Literal
-import random
-import networkx as nx
-import matplotlib.pyplot as plt
-import pydot
-from networkx.drawing.nx_pydot import graphviz_layout
-from IPython.display import Image, display
-from langchain_core.runnables.graph import CurveStyle, MermaidDrawMethod, NodeStyles
-
-
-
-class PipelineState:
-    def __init__(self, reports=None, watchdog_state=None, next=None, classifier_state=None, preprocessing_state =None):
-        self.reports = reports or []
-        self.watchdog_state = watchdog_state
-        self.classifier_state = classifier_state
-        self.preprocessing_state = preprocessing_state
-        self.next = next
-
-    def to_dict(self):
-        return {
-            "reports": self.reports,
-            "watchdog_state": self.watchdog_state,
-            "classifier_state": self.classifier_state,
-            "preprocessing_state":self.preprocessing_state,
-            "next":self.next
-        }
+
+
 
 # --------- Load Environment Variables --------- #
 load_dotenv()
@@ -43,140 +24,326 @@ EMAIL_ADDRESS = os.getenv("EMAIL_ADDRESS")  # your Gmail or SMTP email
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")  # your app-specific password or SMTP password
 SENDER_EMAIL_ADDRESS = os.getenv("SENDER_EMAIL_ADDRESS")
 ADMIN_EMAIL = os.getenv('ADMIN_EMAIL')
-
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    filename="pipeline_run.log",  
-    filemode='w',                 # overwrite each run
-    format='%(asctime)s [%(levelname)s] %(message)s'
-)
+WATCH_FOLDER = "./watch_folder"
+TENANTS_CONFIG = os.getenv("TENANTS_CONFIG")  # JSON list of tenants (folder, recipients, output roots), see Tenant_Scheduler.load_tenants
+SCHEDULER_MODE = os.getenv("SCHEDULER_MODE", "tenants" if TENANTS_CONFIG else "event")  # "event" (inotify/polling watcher), "async" (watcher + ainvoke), "tenants" (many folders, one process) or "interval" (old 60s loop)
+WATCH_POLLING = os.getenv("WATCH_POLLING", "0") == "1"  # force the polling observer, e.g. on network shares
+LEDGER_PATH = os.getenv("LEDGER_PATH", "processed_files.db")
+OUTBOX_PATH = os.getenv("OUTBOX_PATH", "outbox.db")
+OUTBOX_ATTACHMENT_DIR = os.getenv("OUTBOX_ATTACHMENT_DIR", ".outbox_attachments")  # copies of the files queued notifications carry
+WATCHDOG_BATCH = os.getenv("WATCHDOG_BATCH", "1") == "1"  # every pending file per run, validated in a process pool
+STREAM_CHUNKSIZE = int(os.getenv("STREAM_CHUNKSIZE", "0")) or None  # e.g. 500000 to stream multi-GB CSVs in bounded memory
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))  # Prometheus /metrics endpoint, 0 disables it
+RUNS_LOG_PATH = os.getenv("RUNS_LOG_PATH", "pipeline_runs.jsonl")  # one JSON record per pipeline run
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "csv")  # csv, parquet or feather for the Updated/ training split
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", ".result_cache")  # content-hash cache of reports and splits, empty disables it
+RESULT_CACHE_MAX_MB = int(os.getenv("RESULT_CACHE_MAX_MB", "1024"))  # least recently used entries are evicted beyond this
+PIPELINE_CONCURRENCY = int(os.getenv("PIPELINE_CONCURRENCY", str(os.cpu_count() or 4)))  # file pipelines in flight in "async" and "tenants" mode
+INCREMENTAL_APPEND = os.getenv("INCREMENTAL_APPEND", "0") == "1"  # CSVs that only grew are continued from their last offset (CSV output only)
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH")  # e.g. checkpoints.db: every file runs as a resumable LangGraph thread (sync modes)
+RESUME_INTERVAL = float(os.getenv("RESUME_INTERVAL", "300"))  # seconds between retries of failed checkpointed runs in the long-running modes
+NOTIFY_MODE = os.getenv("NOTIFY_MODE", "file")  # "file" (one email per file) or "digest" (one email per recipient and window)
+DIGEST_WINDOW_SECONDS = float(os.getenv("DIGEST_WINDOW_SECONDS", "900"))  # a recipient's digest goes out this long after its first result
+DIGEST_MAX_FILES = int(os.getenv("DIGEST_MAX_FILES", "100"))  # ... or as soon as this many results are collected
+DIGEST_BUNDLE_DIR = os.getenv("DIGEST_BUNDLE_DIR", ".digests")  # zipped revised files waiting to be emailed
+TENANT_MAX_QUEUED = int(os.getenv("TENANT_MAX_QUEUED", "256"))  # per-tenant queue bound, beyond it the tenant falls back to a folder scan
+
+# Set up logging: JSON lines through a background listener, rotated and gzipped (see Pipeline_Logging)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 
 def send_failure_email(error_message):
+    # goes through the outbox so an SMTP outage can't take the scheduler loop down with it
     subject = "Pipeline Failure Alert"
     body = f"The following error occurred in the pipeline: {error_message}"
-    msg = MIMEText(body)
-    msg['Subject'] = subject
-    msg['From'] = EMAIL_ADDRESS
-    msg['To'] = ADMIN_EMAIL  # The administrator or responsible party
-
-    with smtplib.SMTP("smtp.gmail.com", 587) as server:
-        server.starttls()
-        server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-        server.sendmail(EMAIL_ADDRESS, [ADMIN_EMAIL], msg.as_string())
-        logger.info(f"Failure email sent to {ADMIN_EMAIL}")
-
-
-# # Define the loop condition
-# def should_continue(state):
-#     return state.get("next")
-
-
-# Build the graph
-graph = StateGraph(state_schema=dict)
-
-graph.add_node("watchdog", WatchdogAgent(folder_path="./watch_folder"))
-graph.add_node("classifier", ClassifierAgent())
-graph.add_node("preprocessing", PreprocessingAgent())
-
-# Set entry point
-graph.add_edge(START,"watchdog")
-
-# Define edges (based on your WatchdogAgent's 'next')
-graph.add_edge("watchdog", "classifier")
-graph.add_edge("watchdog", "preprocessing")
-
-graph.set_finish_point({"watchdog",'classifier','preprocessing'})
-
-
-app = graph.compile()
+    outbox.enqueue(ADMIN_EMAIL, subject, body)
+    logger.info(f"Failure email queued for {ADMIN_EMAIL}")
+
+
+ledger = FileLedger(LEDGER_PATH)
+outbox = NotificationOutbox(OUTBOX_PATH, attachment_dir=OUTBOX_ATTACHMENT_DIR)
+digest = NotificationDigest(outbox, DIGEST_WINDOW_SECONDS, DIGEST_MAX_FILES, DIGEST_BUNDLE_DIR) if NOTIFY_MODE == "digest" else None
+outbox_worker = OutboxWorker(outbox, digest=digest)
+run_recorder = RunRecorder(RUNS_LOG_PATH)
+result_cache = ResultCache(RESULT_CACHE_DIR, max_bytes=RESULT_CACHE_MAX_MB * 1024 * 1024) if RESULT_CACHE_DIR else None
+
+
+checkpointer = None
+
+
+def get_checkpointer():
+    global checkpointer
+    if checkpointer is None and CHECKPOINT_PATH:
+        checkpointer = open_checkpointer(CHECKPOINT_PATH)
+    return checkpointer
+
+
+def make_app(async_nodes=False, tenant=None, pool=None, checkpointer=None):
+    from Pipeline_Graph import build_graph # pandas and LangGraph are only imported once a graph is needed
+    tenant_options = {}
+    if tenant is not None:
+        tenant_options = dict(recipients=tenant.recipients, updated_root=tenant.updated_root, revised_root=tenant.revised_root)
+    return build_graph(tenant.folder if tenant is not None else WATCH_FOLDER, ledger=ledger, outbox=outbox, batch=WATCHDOG_BATCH,
+                       chunksize=STREAM_CHUNKSIZE, output_format=OUTPUT_FORMAT, async_nodes=async_nodes, result_cache=result_cache,
+                       pool=pool, checkpointer=checkpointer, incremental=INCREMENTAL_APPEND, digest=digest, **tenant_options)
+
+
+app = None
+
+
+def get_app():
+    # compiled on first use, `python cli.py render-graph` draws it on request
+    global app
+    if app is None:
+        app = make_app(checkpointer=get_checkpointer())
+    return app
+
+
+def run_pipeline(trigger_files=None, detected_at=None, target_app=None, tenant=None, folder=None):
+    from Pipeline_Graph import PipelineState
+    if trigger_files is None and get_checkpointer() is not None:
+        # a checkpointed run is one file's thread, so a folder scan becomes one run per pending file
+        trigger_files = pending_files(folder or WATCH_FOLDER)
+        if not trigger_files:
+            logger.info(f"No pending files{f' for {tenant}' if tenant else ''}")
+            return
+    if trigger_files and len(trigger_files) > 1 and get_checkpointer() is not None:
+        for path in trigger_files: # one resumable thread per file, a failing file does not hold up the others
+            run_pipeline([path], detected_at, target_app, tenant)
+        return
+    try:
+        logger.info(f"Triggering pipeline run{f' for {tenant}' if tenant else ''}...")
+        initial_state = PipelineState(trigger_files=trigger_files).to_dict()
+        if detected_at is not None:
+            logger.info(f"Detect-to-invoke latency for {trigger_files}: {(time.monotonic() - detected_at) * 1000:.1f} ms")
+        with track_run(run_recorder, trigger_files=trigger_files, tenant=tenant):
+            target_app = target_app or get_app()
+            if trigger_files and get_checkpointer() is not None:
+                result = run_file_thread(target_app, thread_id_for(trigger_files[0], tenant), initial_state)
+            else:
+                result = target_app.invoke(initial_state)
+        logger.debug("Pipeline result: %s", result) # whole state, sampled and formatted only when DEBUG is on
+        logger.info(f"Pipeline run completed. Outbox: {outbox_worker.metrics()}")
+    except Exception as e:
+        logger.error(f"Pipeline encountered an error: {e}")
+        send_failure_email(f"Pipeline encountered an error: {e}")
+
+
+def run_interval(interval=60):
+    while True:
+        run_pipeline()
+        logger.info(f"Waiting {interval} seconds before next check...")
+        time.sleep(interval)
 
-with open("graph.png", "wb") as f:
-    f.write(app.get_graph().draw_mermaid_png(draw_method=MermaidDrawMethod.API))
 
+def run_event_driven():
+    watcher = FolderWatcher(WATCH_FOLDER, use_polling=WATCH_POLLING).start()
+    try:
+        run_pipeline()  # pick up whatever is already waiting in the folder
+        while True:
+            ready = watcher.wait_for_files()
+            run_pipeline(trigger_files=[path for path, _ in ready], detected_at=min(t for _, t in ready))
+    finally:
+        watcher.stop()
 
-if platform.system() == "Darwin":       # macOS
-    os.system("open graph.png")
-elif platform.system() == "Windows":    # Windows
-    os.system("start graph.png")
-else:                                   # Linux
-    os.system("xdg-open graph.png")
 
-# Run the graph periodically (every 2 minutes)
-if __name__ == "__main__":
-    logger.info("Starting Watchdog Agent Pipeline with scheduler...")
-    while True:
+async def run_pipeline_async(async_app, slots, trigger_files=None, detected_at=None):
+    from Pipeline_Graph import PipelineState
+    async with slots:
         try:
-            logger.info("Triggering pipeline run...")
-            initial_state = PipelineState().to_dict()
-            result = app.invoke(initial_state)
-            logger.info("Hello")
-            logging.info(f"Pipeline result: {result}")
-            logger.info("Pipeline run completed. Waiting 2 minutes before next check...")
-            time.sleep(60)  # 120 seconds = 1 minutes
+            initial_state = PipelineState(trigger_files=trigger_files).to_dict()
+            if detected_at is not None:
+                logger.info(f"Detect-to-invoke latency for {trigger_files}: {(time.monotonic() - detected_at) * 1000:.1f} ms")
+            with track_run(run_recorder, trigger_files=trigger_files):
+                result = await async_app.ainvoke(initial_state)
+            logger.debug("Pipeline result: %s", result) # whole state, sampled and formatted only when DEBUG is on
         except Exception as e:
             logger.error(f"Pipeline encountered an error: {e}")
             send_failure_email(f"Pipeline encountered an error: {e}")
-            time.sleep(60)  # Wait before retrying
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
 
 
+async def run_event_driven_async():
+    # one pipeline per ready file, up to PIPELINE_CONCURRENCY of them in flight on this loop;
+    # not checkpointed (CHECKPOINT_PATH is for the sync modes): the FileLedger records a file as soon as the
+    # watchdog split it, so a classifier or preprocessing failure is alerted but not retried
+    async_app = make_app(async_nodes=True)
+    slots = asyncio.Semaphore(PIPELINE_CONCURRENCY)
+    watcher = FolderWatcher(WATCH_FOLDER, use_polling=WATCH_POLLING).start()
+    in_flight = set()
+    # the ledger only knows a file once its run is over: a second event for a path that is
+    # still running is coalesced into one rerun after it (skipped by the ledger if unchanged)
+    running_paths, rerun_paths = set(), set()
+
+    async def run_file(file_path, detected_at):
+        running_paths.add(file_path)
+        try:
+            await run_pipeline_async(async_app, slots, [file_path], detected_at)
+        finally:
+            running_paths.discard(file_path)
+        if file_path in rerun_paths:
+            rerun_paths.discard(file_path)
+            start(file_path, time.monotonic())
+
+    def start(file_path, detected_at):
+        if file_path in running_paths:
+            rerun_paths.add(file_path)
+            return
+        task = asyncio.create_task(run_file(file_path, detected_at))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    try:
+        await run_pipeline_async(async_app, slots)  # pick up whatever is already waiting in the folder
+        while True:
+            ready = await asyncio.to_thread(watcher.wait_for_files)
+            for file_path, detected_at in ready:
+                start(file_path, detected_at)
+    finally:
+        watcher.stop()
+
+
+def run_tenants():
+    # one compiled graph per tenant, all sharing the ledger, outbox, result cache and one process pool
+    tenants = load_tenants(TENANTS_CONFIG)
+    pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1) if WATCHDOG_BATCH else None
+    apps = {tenant.name: make_app(tenant=tenant, pool=pool, checkpointer=get_checkpointer()) for tenant in tenants}
+
+    def run_tenant(tenant, trigger_files, detected_at):
+        run_pipeline(trigger_files, detected_at, target_app=apps[tenant.name], tenant=tenant.name, folder=tenant.folder)
+
+    scheduler = TenantScheduler(tenants, run_tenant, max_workers=PIPELINE_CONCURRENCY, max_queued=TENANT_MAX_QUEUED,
+                                use_polling=WATCH_POLLING)
+    try:
+        scheduler.run_forever()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def pending_files(folder_path):
+    # a directory listing and ledger lookups only, nothing heavy is imported to find out there is nothing to do
+    if not os.path.isdir(folder_path):
+        return []
+    paths = [os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.endswith(WATCHED_EXTENSIONS)]
+    return [path for path in paths if not ledger.is_processed(path)]
+
+
+def drain_outbox():
+    while outbox_worker.drain() >= outbox_worker.batch_size:
+        pass
+
+
+_active_threads = set()  # checkpoint threads running right now, never resumed a second time alongside
+_active_lock = threading.Lock()
+
+
+def run_file_thread(target_app, thread_id, initial_state):
+    """`run_thread` once per thread at a time; the FileLedger records the file only once the thread completed.
+
+    Returns None without running when the thread is already in progress elsewhere.
+    """
+    with _active_lock:
+        if thread_id in _active_threads:
+            logger.info(f"{thread_id} is already running, skipping")
+            return None
+        _active_threads.add(thread_id)
+    try:
+        result = run_thread(target_app, get_checkpointer(), thread_id, initial_state)
+        ledger.mark_reports(result.get("reports") or [])
+        return result
+    finally:
+        with _active_lock:
+            _active_threads.discard(thread_id)
+
+
+def resume_open_threads(tenants):
+    """Finish the file runs a crash or a failing node left behind, from their last checkpoint."""
+    if not CHECKPOINT_PATH or not has_open_threads(CHECKPOINT_PATH) or get_checkpointer() is None:
+        return 0
+    from Pipeline_Graph import PipelineState
+    apps = {}
+    with _active_lock:
+        thread_ids = [thread_id for thread_id in open_threads(get_checkpointer()) if thread_id not in _active_threads]
+    for thread_id in thread_ids:
+        tenant = tenant_of(thread_id)
+        if tenant is not None and tenant not in tenants:
+            logger.warning(f"Checkpointed run {thread_id} belongs to unknown tenant {tenant}, leaving it")
+            continue
+        if tenant not in apps:
+            apps[tenant] = get_app() if tenant is None else make_app(tenant=tenants[tenant], checkpointer=get_checkpointer())
+        try:
+            with track_run(run_recorder, resumed_thread=thread_id, tenant=tenant):
+                run_file_thread(apps[tenant], thread_id, PipelineState().to_dict())
+        except Exception as e:
+            logger.error(f"Resuming {thread_id} failed again: {e}")
+            send_failure_email(f"Resuming {thread_id} failed again: {e}")
+    return len(thread_ids)
+
+
+def run_once():
+    """Process whatever is pending in the watch folder(s), deliver due notifications and return.
+
+    For cron and one-shot containers: with CHECKPOINT_PATH set, interrupted file
+    runs are resumed first. Returns the number of files that were pending.
+    """
+    tenants = {tenant.name: tenant for tenant in load_tenants(TENANTS_CONFIG)} if TENANTS_CONFIG else {}
+    resumed = resume_open_threads(tenants)
+    if resumed:
+        logger.info(f"Resumed {resumed} interrupted run(s)")
+    targets = [(tenant, tenant.folder) for tenant in tenants.values()] if tenants else [(None, WATCH_FOLDER)]
+    total = 0
+    for tenant, folder in targets:
+        pending = pending_files(folder)
+        total += len(pending)
+        target_app = make_app(tenant=tenant, checkpointer=get_checkpointer()) if tenant is not None and pending else None
+        while pending: # without WATCHDOG_BATCH every run takes one file
+            run_pipeline(pending, target_app=target_app, tenant=tenant.name if tenant is not None else None)
+            remaining = pending_files(folder)
+            if len(remaining) >= len(pending):
+                logger.error(f"{len(remaining)} file(s) in {folder} could not be processed, leaving them for the next run")
+                break
+            pending = remaining
+    drain_outbox()
+    logger.info(f"Single run finished, {total} file(s) were pending. Outbox: {outbox_worker.metrics()}")
+    return total
+
+
+def resume_periodically(tenants, interval=RESUME_INTERVAL):
+    # a thread that failed stays open and its file unrecorded in the FileLedger, so it is retried from here
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                resume_open_threads(tenants)
+            except Exception as e:
+                logger.error(f"Resuming checkpointed runs failed: {e}")
+    threading.Thread(target=loop, name="checkpoint-resume", daemon=True).start()
+
+
+def main(mode=SCHEDULER_MODE):
+    logger.info(f"Starting Watchdog Agent Pipeline with {mode} scheduler...")
+    outbox_worker.start()  # also delivers anything left pending by a previous run
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    if CHECKPOINT_PATH and mode != "async":
+        tenants = {tenant.name: tenant for tenant in load_tenants(TENANTS_CONFIG)} if mode == "tenants" else {}
+        resumed = resume_open_threads(tenants)
+        if resumed:
+            logger.info(f"Resumed {resumed} interrupted run(s)")
+        resume_periodically(tenants)
+    elif CHECKPOINT_PATH:
+        logger.warning("CHECKPOINT_PATH is ignored in async mode, its runs are not checkpointed")
+    if mode == "interval":
+        run_interval()
+    elif mode == "tenants":
+        run_tenants()
+    elif mode == "async":
+        asyncio.run(run_event_driven_async())
+    else:
+        run_event_driven()
+
+
+# Run the graph whenever a file lands in the watch folder
+if __name__ == "__main__":
+    main()